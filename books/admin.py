@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Book
+from .models import Book, DownloadJob
 
 
 @admin.register(Book)
@@ -7,4 +7,12 @@ class BookAdmin(admin.ModelAdmin):
     list_display = ['title', 'author', 'reading_progress', 'created_at']
     list_filter = ['created_at']
     search_fields = ['title', 'author']
-    readonly_fields = ['id', 'created_at']
+    readonly_fields = ['id', 'content_hash', 'created_at']
+
+
+@admin.register(DownloadJob)
+class DownloadJobAdmin(admin.ModelAdmin):
+    list_display = ['flibusta_id', 'title', 'status', 'attempts', 'run_after', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['flibusta_id', 'title', 'author']
+    readonly_fields = ['id', 'book', 'created_at', 'updated_at']
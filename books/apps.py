@@ -5,3 +5,6 @@ class BooksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'books'
     verbose_name = 'Библиотека'
+
+    def ready(self):
+        from . import signals
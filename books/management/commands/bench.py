@@ -0,0 +1,267 @@
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from books.models import Book
+from books.services.artifact_service import ArtifactService
+from books.services.fb2_parser import FB2Parser
+from books.services.flibusta_service import FlibustaService
+from books.services.mirror_pool import MirrorPool
+from books.services.tor_session import TorSessionPool
+
+
+SAMPLE_BOOK = settings.BASE_DIR / '285627.fb2'
+
+
+class FakeFlibustaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    book_data = b''
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.latency)
+
+        if self.path.startswith('/booksearch'):
+            items = ''.join(
+                f'<li><a href="/a/{i}">Автор {i}</a> - <a href="/b/{i}">Книга {i}</a></li>'
+                for i in range(50)
+            )
+            self.respond(f'<html><body><ul>{items}</ul></body></html>'.encode('utf-8'), 'text/html; charset=utf-8')
+        elif self.path.startswith('/b/'):
+            self.respond(self.book_data, 'application/octet-stream', {
+                'Content-Disposition': 'attachment; filename="bench.fb2"',
+            })
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    def respond(self, body, content_type, headers=None):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Command(BaseCommand):
+    help = 'Замеряет производительность парсера, страниц библиотеки и клиента Флибусты'
+
+    SECTIONS = ('parser', 'views', 'flibusta')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=self.SECTIONS, action='append', help='Запустить только указанные группы замеров')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--books', type=int, default=10000, help='Количество книг в тестовой библиотеке')
+        parser.add_argument('--latency', type=float, default=100.0, help='Задержка фейкового сервера Флибусты, мс')
+        parser.add_argument('--output', help='Файл для JSON-результатов')
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        self.results = {}
+        sections = options['only'] or self.SECTIONS
+        self.workdir = tempfile.mkdtemp(prefix='fl-bench-')
+
+        try:
+            with override_settings(
+                MEDIA_ROOT=os.path.join(self.workdir, 'media'),
+                ARTIFACT_ROOT=os.path.join(self.workdir, 'artifacts'),
+                DOWNLOAD_ROOT=os.path.join(self.workdir, 'downloads'),
+            ):
+                if 'parser' in sections:
+                    self.bench_parser()
+                if 'views' in sections:
+                    self.bench_views(options['books'])
+                if 'flibusta' in sections:
+                    self.bench_flibusta(options['latency'] / 1000)
+        finally:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+        report = json.dumps({
+            'commit': self.get_commit(),
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'repeat': self.repeat,
+            'results': self.results,
+        }, ensure_ascii=False, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(report)
+        else:
+            self.stdout.write(report)
+
+    def measure(self, name, func, **extra):
+        func()
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        self.results[name] = {
+            'runs': len(timings),
+            'min_ms': round(min(timings), 3),
+            'median_ms': round(statistics.median(timings), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'max_ms': round(max(timings), 3),
+            **extra,
+        }
+        self.stderr.write(f'{name}: {self.results[name]["median_ms"]} мс')
+
+    def bench_parser(self):
+        large_path = os.path.join(self.workdir, 'large.fb2')
+        self.write_synthetic_book(large_path, sections=400, paragraphs=60, binaries=40, binary_size=256 * 1024)
+
+        zipped_path = os.path.join(self.workdir, 'large.fb2.zip')
+        with zipfile.ZipFile(zipped_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.write(large_path, 'large.fb2')
+
+        for name, path in (
+            ('parser.sample', SAMPLE_BOOK),
+            ('parser.synthetic_large', large_path),
+            ('parser.synthetic_zipped', zipped_path),
+        ):
+            self.measure(name, lambda path=path: FB2Parser(path).parse(), input_bytes=os.path.getsize(path))
+
+    def bench_views(self, book_count):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        try:
+            books_dir = os.path.join(settings.MEDIA_ROOT, 'books')
+            os.makedirs(books_dir, exist_ok=True)
+            shutil.copy(SAMPLE_BOOK, os.path.join(books_dir, 'bench.fb2'))
+
+            Book.objects.bulk_create(
+                [Book(title=f'Книга {i}', author=f'Автор {i % 500}', file='books/bench.fb2') for i in range(book_count)],
+                batch_size=1000
+            )
+            book = Book.objects.first()
+            client = Client()
+
+            def get(url, **headers):
+                response = client.get(url, **headers)
+                if response.status_code != 200:
+                    raise Exception(f'{url}: HTTP {response.status_code}')
+                return response
+
+            async def read_async(response):
+                return b''.join([part async for part in response.streaming_content])
+
+            def size(url, **headers):
+                response = get(url, **headers)
+                if response.streaming and response.is_async:
+                    content = async_to_sync(read_async)(response)
+                elif response.streaming:
+                    content = b''.join(response.streaming_content)
+                else:
+                    content = response.content
+                return len(content)
+
+            self.measure('views.library', lambda: get('/'), response_bytes=size('/'), books=book_count)
+            self.measure('views.library_htmx', lambda: get('/', HTTP_HX_REQUEST='true'), response_bytes=size('/', HTTP_HX_REQUEST='true'))
+            self.measure('views.sitemap', lambda: size('/sitemap.xml'), response_bytes=size('/sitemap.xml'), books=book_count)
+
+            def book_detail_cold():
+                ArtifactService.cache.clear()
+                shutil.rmtree(settings.ARTIFACT_ROOT, ignore_errors=True)
+                Book.objects.filter(id=book.id).update(content_hash=None)
+                get(f'/book/{book.id}/')
+
+            book_url = f'/book/{book.id}/'
+            self.measure('views.book_detail_cold', book_detail_cold)
+            self.measure('views.book_detail_warm', lambda: get(book_url), response_bytes=size(book_url))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def bench_flibusta(self, latency):
+        with open(SAMPLE_BOOK, 'rb') as f:
+            book_data = f.read()
+
+        handler = type('Handler', (FakeFlibustaHandler,), {'latency': latency, 'book_data': book_data})
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        stalled_handler = type('Handler', (FakeFlibustaHandler,), {'latency': latency * 20, 'book_data': book_data})
+        stalled_server = ThreadingHTTPServer(('127.0.0.1', 0), stalled_handler)
+        threading.Thread(target=stalled_server.serve_forever, daemon=True).start()
+
+        mirror = f'http://127.0.0.1:{server.server_address[1]}'
+        stalled_mirror = f'http://127.0.0.1:{stalled_server.server_address[1]}'
+
+        try:
+            with override_settings(FLIBUSTA_ONION=mirror, FLIBUSTA_MIRRORS=[mirror], TOR_PROXY_HOST=''):
+                TorSessionPool.recycle()
+                MirrorPool.reset()
+
+                def download():
+                    os.remove(FlibustaService().download_book('bench'))
+
+                self.measure('flibusta.search', lambda: FlibustaService().search('книга'), latency_ms=latency * 1000)
+                self.measure('flibusta.download_book', download, latency_ms=latency * 1000, response_bytes=len(book_data))
+
+            with override_settings(FLIBUSTA_MIRRORS=[stalled_mirror, mirror], FLIBUSTA_HEDGE_DELAY=latency * 2, TOR_PROXY_HOST=''):
+                def hedged_search():
+                    MirrorPool.reset()
+                    FlibustaService().search('книга')
+
+                self.measure('flibusta.search_hedged', hedged_search, latency_ms=latency * 1000, stalled_latency_ms=latency * 20000)
+                MirrorPool.reset()
+                self.measure('flibusta.search_ranked', lambda: FlibustaService().search('книга'), latency_ms=latency * 1000, stalled_latency_ms=latency * 20000)
+                MirrorPool.reset()
+                TorSessionPool.recycle()
+        finally:
+            for fake in (server, stalled_server):
+                fake.shutdown()
+                fake.server_close()
+
+    def write_synthetic_book(self, path, sections, paragraphs, binaries, binary_size):
+        binary_text = ('A' * 76 + '\n') * (binary_size // 77)
+        paragraph = '<p>' + 'Съешь же ещё этих мягких французских булок, да выпей чаю. ' * 8 + '</p>'
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+            f.write('<FictionBook xmlns="http://www.gribuser.ru/xml/fictionbook/2.0" xmlns:l="http://www.w3.org/1999/xlink">')
+            f.write('<description><title-info><author><first-name>Бенч</first-name><last-name>Марк</last-name></author>')
+            f.write('<book-title>Синтетическая книга</book-title></title-info></description><body>')
+            for i in range(sections):
+                f.write(f'<section><title><p>Глава {i}</p></title>')
+                f.write('<section>' + paragraph * paragraphs + '</section>')
+                f.write('</section>')
+            f.write('</body>')
+            for i in range(binaries):
+                f.write(f'<binary id="img{i}.jpg" content-type="image/jpeg">{binary_text}</binary>')
+            f.write('</FictionBook>')
+
+    def get_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                timeout=5
+            ).stdout.strip() or None
+        except Exception:
+            return None
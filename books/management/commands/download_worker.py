@@ -0,0 +1,61 @@
+import signal
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from books.services.download_queue import DownloadQueueService
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь скачивания книг с Флибусты'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Обработать доступные задачи и завершиться')
+        parser.add_argument('--poll-interval', type=float, default=settings.DOWNLOAD_WORKER_POLL_INTERVAL)
+        parser.add_argument('--concurrency', type=int, default=settings.DOWNLOAD_WORKER_CONCURRENCY, help='Количество одновременных скачиваний')
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        concurrency = max(options['concurrency'], 1)
+        self.stdout.write(f'Обработчик очереди скачивания запущен, потоков: {concurrency}')
+
+        workers = [
+            threading.Thread(target=self.work, args=(options,), daemon=True)
+            for _ in range(concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(timeout=1)
+
+        self.stdout.write('Обработчик очереди скачивания остановлен')
+
+    def work(self, options):
+        try:
+            while self.running:
+                try:
+                    DownloadQueueService.requeue_stale()
+                    job = DownloadQueueService.claim_next()
+
+                    if job is None:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    job = DownloadQueueService.run(job)
+                    self.stdout.write(f'Задача {job.id} ({job.flibusta_id}): {job.get_status_display()}')
+                except Exception as e:
+                    self.stderr.write(f'Ошибка обработчика очереди: {str(e)}')
+                    connection.close()
+                    time.sleep(options['poll_interval'])
+        finally:
+            connection.close()
+
+    def stop(self, signum, frame):
+        self.running = False
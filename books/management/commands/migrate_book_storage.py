@@ -0,0 +1,32 @@
+import os
+from django.core.management.base import BaseCommand
+from books.models import Book
+from books.services.book_storage import BookStorageService
+
+
+class Command(BaseCommand):
+    help = 'Сжимает FB2 файлы библиотеки в zip и переносит их в хранилище по хэшу содержимого'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, сколько места освободится')
+
+    def handle(self, *args, **options):
+        migrated = 0
+        saved_bytes = 0
+
+        for book in Book.objects.only('id', 'file', 'content_hash').iterator():
+            if not book.file or not os.path.exists(book.file.path):
+                continue
+
+            try:
+                saved = BookStorageService.migrate(book, options['dry_run'])
+            except Exception as e:
+                self.stderr.write(f'{book.id}: {str(e)}')
+                continue
+
+            if saved is not None:
+                migrated += 1
+                saved_bytes += saved
+
+        action = 'Будет перенесено' if options['dry_run'] else 'Перенесено'
+        self.stdout.write(f'{action} книг: {migrated}, освобождено: {saved_bytes / 1024 / 1024:.1f} МБ')
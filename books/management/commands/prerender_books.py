@@ -0,0 +1,51 @@
+import os
+import shutil
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from books.models import Book
+from books.services.reading_service import ReadingService
+from books.services.render_service import RenderService
+
+
+class Command(BaseCommand):
+    help = 'Готовит сжатые HTML фрагменты читалки для текущей версии парсера и удаляет устаревшие'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Перерисовать фрагменты, даже если они уже есть')
+        parser.add_argument('--quality', type=int, default=settings.RENDER_BULK_BROTLI_QUALITY, help='Уровень сжатия brotli (0-11)')
+
+    def handle(self, *args, **options):
+        rendered = 0
+        hashes = set()
+
+        for book in Book.objects.iterator():
+            if RenderService.is_rendered(book) and not options['force']:
+                hashes.add(book.content_hash)
+                RenderService.prune(book.content_hash)
+                continue
+            try:
+                ReadingService.prerender(book, options['quality'])
+                rendered += 1
+            except Exception as e:
+                self.stderr.write(f'{book.id}: {str(e)}')
+            if book.content_hash:
+                hashes.add(book.content_hash)
+
+        removed = 0
+        rendered_root = os.path.join(settings.MEDIA_ROOT, 'rendered')
+        if os.path.isdir(rendered_root):
+            found = [
+                (prefix, content_hash)
+                for prefix in os.listdir(rendered_root)
+                for content_hash in os.listdir(os.path.join(rendered_root, prefix))
+                if content_hash not in hashes
+            ]
+            known = set(Book.objects.filter(
+                content_hash__in=[content_hash for _, content_hash in found]
+            ).values_list('content_hash', flat=True))
+            for prefix, content_hash in found:
+                if content_hash not in known:
+                    shutil.rmtree(os.path.join(rendered_root, prefix, content_hash), ignore_errors=True)
+                    removed += 1
+
+        self.stdout.write(f'Подготовлено книг: {rendered}, удалено устаревших: {removed}')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from books.models import Book
+from books.services.cover_service import CoverService
+from books.services.fb2_parser import FB2Parser
+from books.services.reading_service import ReadingService
+
+
+class Command(BaseCommand):
+    help = 'Создаёт размеры и форматы обложек для книг, добавленных до появления конвейера обложек'
+
+    def handle(self, *args, **options):
+        processed = 0
+
+        for book in Book.objects.filter(cover_variants={}).iterator():
+            try:
+                cover_data = FB2Parser(book.file.path).parse().get('cover')
+                if not cover_data:
+                    continue
+                old_cover = book.cover.name if book.cover else None
+                CoverService.apply(book, cover_data)
+                book.save(update_fields=['cover', 'cover_variants', 'cover_placeholder', 'updated_at'])
+                if old_cover and old_cover != book.cover.name and book.cover.storage.exists(old_cover):
+                    book.cover.storage.delete(old_cover)
+                ReadingService.prerender(book)
+                processed += 1
+            except Exception as e:
+                self.stderr.write(f'{book.id}: {str(e)}')
+
+        self.stdout.write(f'Обработано обложек: {processed}')
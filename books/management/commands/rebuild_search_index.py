@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from books.models import Book
+from books.services.artifact_service import ArtifactService
+from books.services.search_index import SearchIndexService
+
+
+class Command(BaseCommand):
+    help = 'Индексирует книги библиотеки для полнотекстового поиска'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Переиндексировать все книги, а не только отсутствующие в индексе')
+
+    def handle(self, *args, **options):
+        indexed_ids = set() if options['all'] else SearchIndexService.indexed_ids()
+        indexed = 0
+
+        for book in Book.objects.iterator():
+            if str(book.id) in indexed_ids:
+                continue
+            try:
+                artifact = ArtifactService.load(book)
+                SearchIndexService.index(book, ArtifactService.text(artifact))
+                indexed += 1
+            except Exception as e:
+                self.stderr.write(f'{book.id}: {str(e)}')
+
+        self.stdout.write(f'Проиндексировано книг: {indexed}')
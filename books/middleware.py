@@ -0,0 +1,34 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from .services.metrics import Metrics
+
+
+class MetricsMiddleware:
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token, started = Metrics.start_request()
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            Metrics.finish_request(request, response, token, started)
+
+    async def __acall__(self, request):
+        token, started = Metrics.start_request()
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            Metrics.finish_request(request, response, token, started)
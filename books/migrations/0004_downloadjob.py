@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 04:25
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_book_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DownloadJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('flibusta_id', models.CharField(max_length=100, verbose_name='ID Флибусты')),
+                ('title', models.CharField(blank=True, max_length=500, verbose_name='Название')),
+                ('author', models.CharField(blank=True, max_length=300, verbose_name='Автор')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Скачивается'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('attempts', models.IntegerField(default=0, verbose_name='Попытки')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Запуск не раньше')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('book', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='download_jobs', to='books.book', verbose_name='Книга')),
+            ],
+            options={
+                'verbose_name': 'Задача скачивания',
+                'verbose_name_plural': 'Задачи скачивания',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='books_job_status_run_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_downloadjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Ключ')),
+                ('query', models.CharField(max_length=500, verbose_name='Запрос')),
+                ('results', models.JSONField(default=list, verbose_name='Результаты')),
+                ('fetched_at', models.DateTimeField(db_index=True, verbose_name='Дата получения')),
+                ('refreshing_at', models.DateTimeField(blank=True, null=True, verbose_name='Обновляется с')),
+            ],
+            options={
+                'verbose_name': 'Кэш поиска',
+                'verbose_name_plural': 'Кэш поиска',
+            },
+        ),
+    ]
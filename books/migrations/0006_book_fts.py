@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_searchcacheentry'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS books_book_fts USING fts5("
+                "book_id UNINDEXED, title, author, body, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            ),
+            reverse_sql="DROP TABLE IF EXISTS books_book_fts",
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_book_fts'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='book',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name': 'Книга', 'verbose_name_plural': 'Книги'},
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-created_at', '-id'], name='books_book_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-last_read'], name='books_book_last_read_idx'),
+        ),
+    ]
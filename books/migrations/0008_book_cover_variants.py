@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_book_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='cover_placeholder',
+            field=models.TextField(blank=True, verbose_name='Превью обложки'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Варианты обложки'),
+        ),
+    ]
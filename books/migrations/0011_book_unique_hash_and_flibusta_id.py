@@ -0,0 +1,73 @@
+# Generated by Django 6.0 on 2026-10-18 10:05
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def delete_files(Book, duplicate, keep):
+    names = {duplicate.file.name, duplicate.cover.name if duplicate.cover else ''}
+    for variant in (duplicate.cover_variants or {}).values():
+        names.update(variant.get('formats', {}).values())
+
+    kept = {keep.file.name, keep.cover.name if keep.cover else ''}
+    for variant in (keep.cover_variants or {}).values():
+        kept.update(variant.get('formats', {}).values())
+
+    for name in names - kept:
+        if not name:
+            continue
+        others = Book.objects.exclude(id=duplicate.id)
+        if others.filter(models.Q(file=name) | models.Q(cover=name)).exists():
+            continue
+        try:
+            default_storage.delete(name)
+        except Exception:
+            pass
+
+
+def merge_duplicates(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    DownloadJob = apps.get_model('books', 'DownloadJob')
+    Book.objects.filter(flibusta_id='').update(flibusta_id=None)
+
+    for field in ('flibusta_id', 'content_hash'):
+        kept = {}
+        books = Book.objects.exclude(**{f'{field}__isnull': True}).order_by('created_at', 'id')
+        for book in list(books):
+            value = getattr(book, field)
+            keep = kept.setdefault(value, book)
+            if keep is book:
+                continue
+
+            if book.last_read and (not keep.last_read or book.last_read > keep.last_read):
+                keep.last_read = book.last_read
+                keep.reading_progress = book.reading_progress
+                Book.objects.filter(id=keep.id).update(last_read=keep.last_read, reading_progress=keep.reading_progress)
+            if not keep.content_hash and book.content_hash:
+                keep.content_hash = book.content_hash
+                Book.objects.filter(id=keep.id).update(content_hash=keep.content_hash)
+
+            DownloadJob.objects.filter(book_id=book.id).update(book_id=keep.id)
+            delete_files(Book, book, keep)
+            book.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0010_book_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='book',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='Хэш содержимого'),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='flibusta_id',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True, verbose_name='ID Флибусты'),
+        ),
+    ]
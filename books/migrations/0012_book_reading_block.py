@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0011_book_unique_hash_and_flibusta_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='reading_block',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Позиция чтения (номер абзаца)'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 12:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_batches(apps, schema_editor):
+    DownloadJob = apps.get_model('books', 'DownloadJob')
+    DownloadBatchItem = apps.get_model('books', 'DownloadBatchItem')
+    jobs = DownloadJob.objects.exclude(batch__isnull=True).order_by('created_at').values_list('id', 'batch')
+    DownloadBatchItem.objects.bulk_create(
+        [DownloadBatchItem(batch=batch, job_id=job_id) for job_id, batch in jobs.iterator()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0012_book_reading_block'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DownloadBatchItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch', models.UUIDField(db_index=True, verbose_name='Пакет')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batch_items', to='books.downloadjob', verbose_name='Задача')),
+            ],
+            options={
+                'verbose_name': 'Задача в пакете',
+                'verbose_name_plural': 'Задачи в пакетах',
+                'ordering': ['id'],
+                'constraints': [models.UniqueConstraint(fields=('batch', 'job'), name='books_batch_item_unique')],
+            },
+        ),
+        migrations.RunPython(copy_batches, migrations.RunPython.noop),
+    ]
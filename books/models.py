@@ -1,5 +1,7 @@
 import uuid
+from django.core.files.storage import default_storage
 from django.db import models
+from django.utils import timezone
 
 
 class Book(models.Model):
@@ -7,16 +9,125 @@ class Book(models.Model):
     title = models.CharField(max_length=500, verbose_name='Название')
     author = models.CharField(max_length=300, verbose_name='Автор')
     cover = models.ImageField(upload_to='covers/', null=True, blank=True, verbose_name='Обложка')
+    cover_variants = models.JSONField(default=dict, blank=True, verbose_name='Варианты обложки')
+    cover_placeholder = models.TextField(blank=True, verbose_name='Превью обложки')
     file = models.FileField(upload_to='books/', verbose_name='Файл книги')
-    flibusta_id = models.CharField(max_length=100, null=True, blank=True, verbose_name='ID Флибусты')
+    flibusta_id = models.CharField(max_length=100, null=True, blank=True, unique=True, verbose_name='ID Флибусты')
+    content_hash = models.CharField(max_length=64, null=True, blank=True, unique=True, verbose_name='Хэш содержимого')
     reading_progress = models.IntegerField(default=0, verbose_name='Прогресс чтения')
+    reading_block = models.PositiveIntegerField(null=True, blank=True, verbose_name='Позиция чтения (номер абзаца)')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата добавления')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения')
     last_read = models.DateTimeField(null=True, blank=True, verbose_name='Последнее чтение')
 
     class Meta:
         verbose_name = 'Книга'
         verbose_name_plural = 'Книги'
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='books_book_created_idx'),
+            models.Index(fields=['-last_read'], name='books_book_last_read_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.author}"
+
+    def _cover_srcset(self, extension):
+        entries = []
+        for variant in self.cover_variants.values():
+            name = variant['formats'].get(extension)
+            if name:
+                entries.append(f"{default_storage.url(name)} {variant['width']}w")
+        return ', '.join(entries)
+
+    @property
+    def cover_picture(self):
+        grid = (self.cover_variants or {}).get('grid')
+        if not grid:
+            return None
+
+        sources = []
+        for extension, mime_type in (('avif', 'image/avif'), ('webp', 'image/webp')):
+            if extension in grid['formats']:
+                sources.append({'type': mime_type, 'srcset': self._cover_srcset(extension)})
+
+        return {
+            'sources': sources,
+            'src': default_storage.url(grid['formats']['jpg']),
+            'srcset': self._cover_srcset('jpg'),
+            'width': grid['width'],
+            'height': grid['height'],
+        }
+
+
+class DownloadJob(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Скачивается'),
+        (STATUS_DONE, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+    ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    flibusta_id = models.CharField(max_length=100, verbose_name='ID Флибусты')
+    title = models.CharField(max_length=500, blank=True, verbose_name='Название')
+    author = models.CharField(max_length=300, blank=True, verbose_name='Автор')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='Статус')
+    attempts = models.IntegerField(default=0, verbose_name='Попытки')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    book = models.ForeignKey(Book, null=True, blank=True, on_delete=models.SET_NULL, related_name='download_jobs', verbose_name='Книга')
+    batch = models.UUIDField(null=True, blank=True, db_index=True, verbose_name='Пакет')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='Запуск не раньше')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    class Meta:
+        verbose_name = 'Задача скачивания'
+        verbose_name_plural = 'Задачи скачивания'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='books_job_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.flibusta_id} - {self.get_status_display()}"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+
+class DownloadBatchItem(models.Model):
+    batch = models.UUIDField(db_index=True, verbose_name='Пакет')
+    job = models.ForeignKey(DownloadJob, on_delete=models.CASCADE, related_name='batch_items', verbose_name='Задача')
+
+    class Meta:
+        verbose_name = 'Задача в пакете'
+        verbose_name_plural = 'Задачи в пакетах'
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['batch', 'job'], name='books_batch_item_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.batch} - {self.job_id}"
+
+
+class SearchCacheEntry(models.Model):
+    key = models.CharField(max_length=64, unique=True, verbose_name='Ключ')
+    query = models.CharField(max_length=500, verbose_name='Запрос')
+    results = models.JSONField(default=list, verbose_name='Результаты')
+    fetched_at = models.DateTimeField(db_index=True, verbose_name='Дата получения')
+    refreshing_at = models.DateTimeField(null=True, blank=True, verbose_name='Обновляется с')
+
+    class Meta:
+        verbose_name = 'Кэш поиска'
+        verbose_name_plural = 'Кэш поиска'
+
+    def __str__(self):
+        return self.query
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import zipfile
+from bisect import bisect_right
+from html import unescape
+from django.conf import settings
+from ..models import Book
+from .fb2_parser import FB2Parser, InvalidBook, PARSER_VERSION
+from .image_service import ImageService
+from .metrics import Metrics
+from .lru_cache import SizedLRUCache
+
+
+class ArtifactService:
+
+    ARTIFACT_FIELDS = ('title', 'author')
+    TAG_PATTERN = re.compile(r'<[^>]+>')
+    IMAGE_PATTERN = re.compile(r'<img [^>]*src="([^"]+)"')
+
+    cache = SizedLRUCache(settings.ARTIFACT_CACHE_MAX_BYTES)
+
+    @staticmethod
+    def compute_hash(file_path):
+        digest = hashlib.sha256()
+        try:
+            with FB2Parser(file_path).open() as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+        except zipfile.BadZipFile as e:
+            raise InvalidBook(f"Повреждённый архив книги: {str(e)}")
+        return digest.hexdigest()
+
+    @staticmethod
+    def artifact_path(content_hash, version=PARSER_VERSION):
+        return os.path.join(
+            settings.ARTIFACT_ROOT,
+            content_hash[:2],
+            f'{content_hash}.v{version}.json'
+        )
+
+    @staticmethod
+    def images_path(content_hash):
+        return os.path.join(settings.ARTIFACT_ROOT, content_hash[:2], f'{content_hash}.images.json')
+
+    @staticmethod
+    def write_atomic(path, payload):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def split_chunks(blocks, chunk_size):
+        chunks = []
+        offsets = []
+        chunk_notes = []
+        chunk_blocks = []
+        block_offsets = []
+        toc = []
+        parts = []
+        refs = []
+        size = 0
+        offset = 0
+        has_body = False
+
+        for number, block in enumerate(blocks):
+            starts_chapter = block['section'] and has_body and size >= chunk_size // 4
+            if parts and (size >= chunk_size or starts_chapter):
+                chunks.append('\n'.join(parts))
+                offsets.append(offset)
+                chunk_notes.append(refs)
+                chunk_blocks.append(number - len(parts))
+                offset += size
+                parts = []
+                refs = []
+                size = 0
+                has_body = False
+
+            if block['heading']:
+                toc.append({
+                    'title': ' '.join(block['text'].split()),
+                    'depth': block['heading'],
+                    'chunk': len(chunks),
+                    'offset': offset + size,
+                })
+            else:
+                has_body = True
+
+            block_offsets.append(offset + size)
+            parts.append(block['html'])
+            refs.extend(ref for ref in block['notes'] if ref not in refs)
+            size += len(block['text']) + 1
+
+        chunks.append('\n'.join(parts))
+        offsets.append(offset)
+        chunk_notes.append(refs)
+        chunk_blocks.append(len(blocks) - len(parts))
+        return {
+            'chunks': chunks,
+            'offsets': offsets,
+            'chunk_notes': chunk_notes,
+            'chunk_blocks': chunk_blocks,
+            'block_offsets': block_offsets,
+            'toc': toc,
+            'length': max(offset + size - 1, 0),
+        }
+
+    @classmethod
+    def store(cls, content_hash, book_data):
+        artifact = {field: book_data.get(field, '') for field in cls.ARTIFACT_FIELDS}
+        artifact.update(cls.split_chunks(book_data.get('blocks', []), settings.READER_CHUNK_SIZE))
+        notes = book_data.get('notes', {})
+        artifact['chunk_notes'] = [[ref for ref in refs if ref in notes] for refs in artifact['chunk_notes']]
+        artifact['notes'] = notes
+        artifact['version'] = PARSER_VERSION
+        artifact['content_hash'] = content_hash
+        payload = json.dumps(artifact, ensure_ascii=False).encode('utf-8')
+
+        cls.write_atomic(cls.artifact_path(content_hash), payload)
+        cls.write_atomic(cls.images_path(content_hash), json.dumps(cls.find_images(artifact)).encode('utf-8'))
+
+        cls.cache.set(content_hash, artifact, len(payload))
+        return artifact
+
+    @classmethod
+    def find_images(cls, artifact):
+        parts = artifact.get('chunks', []) + list(artifact.get('notes', {}).values())
+        return sorted({unescape(url) for url in cls.IMAGE_PATTERN.findall('\n'.join(parts))})
+
+    @classmethod
+    def images(cls, content_hash):
+        try:
+            with open(cls.images_path(content_hash), 'rb') as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            pass
+
+        artifact = cls.read(content_hash)
+        if artifact is None:
+            return None
+        images = cls.find_images(artifact)
+        cls.write_atomic(cls.images_path(content_hash), json.dumps(images).encode('utf-8'))
+        return images
+
+    @classmethod
+    def unused_images(cls, images):
+        unused = set(images)
+        hashes = Book.objects.exclude(content_hash__isnull=True).exclude(content_hash='').values_list('content_hash', flat=True)
+        for content_hash in hashes.iterator():
+            if not unused:
+                break
+            used = cls.images(content_hash)
+            if used is None:
+                return set()
+            unused.difference_update(used)
+        return unused
+
+    @classmethod
+    def build(cls, file_path, content_hash=None):
+        content_hash = content_hash or cls.compute_hash(file_path)
+        book_data = FB2Parser(file_path).parse(ImageService.store)
+        cls.store(content_hash, book_data)
+        return content_hash, book_data
+
+    @classmethod
+    def read(cls, content_hash):
+        artifact = cls.cache.get(content_hash)
+        if artifact is not None:
+            Metrics.cache_result('artifact', 'hit')
+            return artifact
+        Metrics.cache_result('artifact', 'miss')
+
+        try:
+            with open(cls.artifact_path(content_hash), 'rb') as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+
+        artifact = json.loads(payload)
+        if artifact.get('version') != PARSER_VERSION:
+            return None
+
+        cls.cache.set(content_hash, artifact, len(payload))
+        return artifact
+
+    @classmethod
+    def load(cls, book):
+        content_hash = book.content_hash or cls.compute_hash(book.file.path)
+
+        artifact = cls.read(content_hash)
+        if artifact is None:
+            artifact = cls.store(content_hash, FB2Parser(book.file.path).parse(ImageService.store))
+
+        if book.content_hash != content_hash:
+            book.content_hash = content_hash
+            if not Book.objects.filter(content_hash=content_hash).exclude(id=book.id).exists():
+                book.save(update_fields=['content_hash'])
+        return artifact
+
+    @staticmethod
+    def locate(artifact, block):
+        block = max(0, min(block, len(artifact['block_offsets']) - 1))
+        return block, max(0, bisect_right(artifact['chunk_blocks'], block) - 1)
+
+    @staticmethod
+    def block_at(artifact, position):
+        return max(0, bisect_right(artifact['block_offsets'], position) - 1)
+
+    @staticmethod
+    def block_progress(artifact, block):
+        block_offsets = artifact['block_offsets']
+        if block <= 0 or not block_offsets:
+            return 0
+        if block >= len(block_offsets) - 1:
+            return 100
+        return round(block_offsets[block] * 100 / (artifact['length'] or 1))
+
+    @classmethod
+    def text(cls, artifact):
+        parts = artifact.get('chunks', []) + list(artifact.get('notes', {}).values())
+        return unescape(cls.TAG_PATTERN.sub('', '\n'.join(parts)))
+
+    @classmethod
+    def delete(cls, content_hash):
+        if not content_hash or Book.objects.filter(content_hash=content_hash).exists():
+            return
+
+        images = cls.images(content_hash) or []
+        cls.cache.delete(content_hash)
+        directory = os.path.join(settings.ARTIFACT_ROOT, content_hash[:2])
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.startswith(f'{content_hash}.'):
+                    os.remove(os.path.join(directory, name))
+
+        if images:
+            ImageService.delete(cls.unused_images(images))
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from django.conf import settings
+from django.core.files import File
+from ..models import Book
+from .artifact_service import ArtifactService
+
+
+class BookStorageService:
+
+    @staticmethod
+    def is_compressed(path):
+        return zipfile.is_zipfile(path)
+
+    @staticmethod
+    def storage_name(content_hash):
+        return f'books/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.fb2.zip'
+
+    @staticmethod
+    def member_name(name):
+        base = os.path.basename(name)
+        if base.endswith('.zip'):
+            base = base[:-4]
+        if not base.endswith('.fb2'):
+            base = f'{base}.fb2'
+        return base
+
+    @classmethod
+    def compress(cls, source_path, name):
+        os.makedirs(settings.DOWNLOAD_ROOT, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix='.fb2.zip', dir=settings.DOWNLOAD_ROOT)
+        os.close(fd)
+
+        try:
+            with zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=settings.BOOK_STORAGE_COMPRESSLEVEL) as zf:
+                with open(source_path, 'rb') as source, zf.open(cls.member_name(name), 'w') as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        return temp_path
+
+    @classmethod
+    def _place(cls, storage, name, path):
+        if storage.exists(name):
+            return name
+        with open(path, 'rb') as f:
+            saved_name = storage.save(name, File(f))
+        if saved_name != name:
+            storage.delete(saved_name)
+        return name
+
+    @classmethod
+    def save(cls, book, file_path, content_hash):
+        storage = book.file.storage
+        name = cls.storage_name(content_hash)
+
+        if cls.is_compressed(file_path):
+            book.file.name = cls._place(storage, name, file_path)
+            return
+
+        compressed_path = cls.compress(file_path, os.path.basename(file_path))
+        try:
+            book.file.name = cls._place(storage, name, compressed_path)
+        finally:
+            os.remove(compressed_path)
+
+    @classmethod
+    def migrate(cls, book, dry_run=False):
+        storage = book.file.storage
+        old_name = book.file.name
+        old_path = book.file.path
+        compressed = cls.is_compressed(old_path)
+
+        content_hash = book.content_hash
+        if not content_hash:
+            content_hash = ArtifactService.compute_hash(old_path)
+            if Book.objects.filter(content_hash=content_hash).exclude(id=book.id).exists():
+                raise Exception('Книга с таким содержимым уже есть в библиотеке')
+
+        name = cls.storage_name(content_hash)
+        if compressed and old_name == name:
+            return None
+
+        old_size = os.path.getsize(old_path)
+        source_path = old_path if compressed else cls.compress(old_path, old_name)
+        try:
+            if not compressed and ArtifactService.compute_hash(source_path) != content_hash:
+                raise Exception('Содержимое архива не совпадает с исходным файлом')
+            new_size = os.path.getsize(source_path)
+
+            if not dry_run:
+                cls._place(storage, name, source_path)
+                Book.objects.filter(id=book.id).update(file=name, content_hash=content_hash)
+                storage.delete(old_name)
+        finally:
+            if source_path != old_path:
+                os.remove(source_path)
+
+        return old_size - new_size
@@ -0,0 +1,105 @@
+import base64
+import hashlib
+from io import BytesIO
+from PIL import Image, ImageFilter, features
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from ..models import Book
+from .metrics import Metrics
+
+
+class CoverService:
+
+    SIZES = {
+        'grid': (200, 300),
+        'reader': (400, 600),
+    }
+    PLACEHOLDER_SIZE = (16, 24)
+    FORMATS = [
+        ('avif', 'AVIF', 'image/avif', {'quality': 50, 'speed': 8}),
+        ('webp', 'WEBP', 'image/webp', {'quality': 75, 'method': 4}),
+        ('jpg', 'JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    ]
+
+    @classmethod
+    def available_formats(cls):
+        return [
+            spec for spec in cls.FORMATS
+            if spec[1] == 'JPEG' or features.check(spec[1].lower())
+        ]
+
+    @classmethod
+    @Metrics.COVER_SECONDS.time()
+    def process(cls, image_data):
+        try:
+            digest = hashlib.sha256(image_data).hexdigest()[:32]
+            image = Image.open(BytesIO(image_data))
+            image.load()
+            image = image.convert('RGB')
+        except Exception as e:
+            raise Exception(f"Ошибка обработки обложки: {str(e)}")
+
+        variants = {}
+        for size_name, max_size in cls.SIZES.items():
+            resized = image.copy()
+            resized.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+            formats = {}
+            for extension, pil_format, mime_type, options in cls.available_formats():
+                name = f'covers/{digest[:2]}/{digest}-{size_name}.{extension}'
+                if not default_storage.exists(name):
+                    output = BytesIO()
+                    resized.save(output, format=pil_format, **options)
+                    saved_name = default_storage.save(name, ContentFile(output.getvalue()))
+                    if saved_name != name:
+                        default_storage.delete(saved_name)
+                formats[extension] = name
+
+            variants[size_name] = {
+                'width': resized.width,
+                'height': resized.height,
+                'formats': formats,
+            }
+
+        return {
+            'cover': variants['reader']['formats']['jpg'],
+            'variants': variants,
+            'placeholder': cls.make_placeholder(image),
+        }
+
+    @classmethod
+    def make_placeholder(cls, image):
+        tiny = image.copy()
+        tiny.thumbnail(cls.PLACEHOLDER_SIZE, Image.Resampling.BILINEAR)
+        tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+
+        output = BytesIO()
+        if features.check('webp'):
+            tiny.save(output, format='WEBP', quality=30)
+            mime_type = 'image/webp'
+        else:
+            tiny.save(output, format='JPEG', quality=30)
+            mime_type = 'image/jpeg'
+        return f"data:{mime_type};base64,{base64.b64encode(output.getvalue()).decode('ascii')}"
+
+    @classmethod
+    def apply(cls, book, image_data):
+        processed = cls.process(image_data)
+        book.cover.name = processed['cover']
+        book.cover_variants = processed['variants']
+        book.cover_placeholder = processed['placeholder']
+
+    @staticmethod
+    def delete(book):
+        names = set()
+        if book.cover:
+            names.add(book.cover.name)
+        for variant in (book.cover_variants or {}).values():
+            names.update(variant.get('formats', {}).values())
+
+        if not names or (book.cover and Book.objects.filter(cover=book.cover.name).exists()):
+            return
+
+        for name in names:
+            if default_storage.exists(name):
+                default_storage.delete(name)
@@ -0,0 +1,174 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from ..models import Book, DownloadBatchItem, DownloadJob
+from .fb2_parser import InvalidBook
+from .flibusta_service import FlibustaService
+from .ingest_service import IngestService
+
+
+class DownloadQueueService:
+
+    @staticmethod
+    def existing_books(flibusta_ids):
+        return dict(Book.objects.filter(flibusta_id__in=flibusta_ids).values_list('flibusta_id', 'id'))
+
+    @classmethod
+    def enqueue(cls, flibusta_id, title='', author=''):
+        book_id = cls.existing_books([flibusta_id]).get(flibusta_id)
+        if book_id is None:
+            active = DownloadJob.objects.filter(
+                flibusta_id=flibusta_id,
+                status__in=DownloadJob.ACTIVE_STATUSES
+            ).order_by('created_at').first()
+            if active is not None:
+                return active
+
+        return DownloadJob.objects.create(
+            flibusta_id=flibusta_id,
+            title=title,
+            author=author,
+            book_id=book_id,
+            status=DownloadJob.STATUS_DONE if book_id else DownloadJob.STATUS_PENDING
+        )
+
+    @classmethod
+    def enqueue_batch(cls, items):
+        batch = uuid.uuid4()
+        seen = set()
+        jobs = []
+        members = []
+
+        items = items[:settings.DOWNLOAD_BATCH_MAX_SIZE]
+        flibusta_ids = [str(item.get('id', '')).strip() for item in items]
+        existing = cls.existing_books(flibusta_ids)
+        active = {}
+        for job in DownloadJob.objects.filter(
+            flibusta_id__in=flibusta_ids,
+            status__in=DownloadJob.ACTIVE_STATUSES
+        ).order_by('created_at'):
+            active.setdefault(job.flibusta_id, job)
+
+        for item in items:
+            flibusta_id = str(item.get('id', '')).strip()
+            if not flibusta_id or flibusta_id in seen:
+                continue
+            seen.add(flibusta_id)
+            book_id = existing.get(flibusta_id)
+            if book_id is None and flibusta_id in active:
+                members.append(active[flibusta_id])
+                continue
+            job = DownloadJob(
+                flibusta_id=flibusta_id,
+                title=item.get('title') or 'Без названия',
+                author=item.get('author') or 'Неизвестный автор',
+                batch=batch,
+                book_id=book_id,
+                status=DownloadJob.STATUS_DONE if book_id else DownloadJob.STATUS_PENDING
+            )
+            jobs.append(job)
+            members.append(job)
+
+        DownloadJob.objects.bulk_create(jobs)
+        DownloadBatchItem.objects.bulk_create([DownloadBatchItem(batch=batch, job=job) for job in members])
+        return batch, jobs
+
+    @staticmethod
+    def batch_progress(batch):
+        items = DownloadBatchItem.objects.filter(batch=batch).select_related('job__book')
+        jobs = [item.job for item in items]
+        counts = {status: 0 for status, _ in DownloadJob.STATUS_CHOICES}
+        for job in jobs:
+            counts[job.status] += 1
+
+        return {
+            'batch': batch,
+            'jobs': jobs,
+            'total': len(jobs),
+            'done': counts[DownloadJob.STATUS_DONE],
+            'failed': counts[DownloadJob.STATUS_FAILED],
+            'active': counts[DownloadJob.STATUS_PENDING] + counts[DownloadJob.STATUS_RUNNING],
+        }
+
+    @staticmethod
+    def claim_next():
+        now = timezone.now()
+        candidates = DownloadJob.objects.filter(
+            status=DownloadJob.STATUS_PENDING,
+            run_after__lte=now
+        ).order_by('run_after', 'created_at').values_list('id', flat=True)[:10]
+
+        for job_id in candidates:
+            claimed = DownloadJob.objects.filter(
+                id=job_id,
+                status=DownloadJob.STATUS_PENDING
+            ).update(
+                status=DownloadJob.STATUS_RUNNING,
+                attempts=F('attempts') + 1,
+                updated_at=now
+            )
+            if claimed:
+                return DownloadJob.objects.get(id=job_id)
+        return None
+
+    @staticmethod
+    def retry_delay(attempts):
+        delay = settings.DOWNLOAD_JOB_RETRY_DELAY * (2 ** max(attempts - 1, 0))
+        delay = min(delay, settings.DOWNLOAD_JOB_MAX_RETRY_DELAY)
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    @staticmethod
+    def heartbeat(job):
+        interval = settings.DOWNLOAD_JOB_STALE_TIMEOUT / 4
+        last = [time.monotonic()]
+
+        def beat():
+            now = time.monotonic()
+            if now - last[0] < interval:
+                return
+            last[0] = now
+            DownloadJob.objects.filter(
+                id=job.id,
+                status=DownloadJob.STATUS_RUNNING
+            ).update(updated_at=timezone.now())
+
+        return beat
+
+    @classmethod
+    def run(cls, job):
+        try:
+            book = Book.objects.filter(flibusta_id=job.flibusta_id).first()
+            if book is None:
+                file_path = FlibustaService().download_book(job.flibusta_id, job.id, cls.heartbeat(job))
+                book = IngestService.ingest(file_path, job.flibusta_id, job.title, job.author)
+        except Exception as e:
+            job.error = str(e)
+            if isinstance(e, InvalidBook) or job.attempts >= settings.DOWNLOAD_JOB_MAX_ATTEMPTS:
+                job.status = DownloadJob.STATUS_FAILED
+                FlibustaService.discard_part(job.flibusta_id, job.id)
+            else:
+                job.status = DownloadJob.STATUS_PENDING
+                job.run_after = timezone.now() + cls.retry_delay(job.attempts)
+            job.save(update_fields=['status', 'error', 'run_after', 'updated_at'])
+            return job
+
+        job.book = book
+        job.error = ''
+        job.status = DownloadJob.STATUS_DONE
+        job.save(update_fields=['book', 'status', 'error', 'updated_at'])
+        return job
+
+    @staticmethod
+    def requeue_stale():
+        threshold = timezone.now() - timedelta(seconds=settings.DOWNLOAD_JOB_STALE_TIMEOUT)
+        return DownloadJob.objects.filter(
+            status=DownloadJob.STATUS_RUNNING,
+            updated_at__lt=threshold
+        ).update(
+            status=DownloadJob.STATUS_PENDING,
+            run_after=timezone.now()
+        )
@@ -1,58 +1,232 @@
+import os
 import zipfile
 import base64
+from contextlib import contextmanager
 from io import BytesIO
 from lxml import etree
 from PIL import Image
-from django.core.files.base import ContentFile
+from django.conf import settings
+from .fb2_renderer import FB2Renderer, XLINK_HREF
+from .metrics import Metrics
+
+
+PARSER_VERSION = 9
+
+FB2_NAMESPACE = 'http://www.gribuser.ru/xml/fictionbook/2.0'
+
+
+class InvalidBook(Exception):
+    pass
+
+
+class LimitedReader:
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.consumed = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.consumed += len(data)
+        if self.consumed > self.limit:
+            raise InvalidBook("Файл книги превышает допустимый размер")
+        return data
 
 
 class FB2Parser:
 
     def __init__(self, file_path):
         self.file_path = file_path
-        self.ns = {'fb': 'http://www.gribuser.ru/xml/fictionbook/2.0'}
+        self.ns = {'fb': FB2_NAMESPACE}
 
-    def parse(self):
+    def parse(self, image_handler=None):
         try:
-            with open(self.file_path, 'rb') as f:
-                content = f.read()
-
-            if content[:2] == b'PK':
-                with zipfile.ZipFile(BytesIO(content)) as zf:
-                    fb2_file = None
-                    for name in zf.namelist():
-                        if name.endswith('.fb2'):
-                            fb2_file = name
-                            break
-                    if fb2_file:
-                        content = zf.read(fb2_file)
-
-            tree = etree.fromstring(content)
-
-            title = self._get_title(tree)
-            author = self._get_author(tree)
-            cover_data = self._get_cover(tree)
-            text = self._get_text(tree)
-
-            return {
-                'title': title,
-                'author': author,
-                'cover': cover_data,
-                'text': text
-            }
+            Metrics.PARSE_INPUT_BYTES.observe(os.path.getsize(self.file_path))
+            with Metrics.PARSE_SECONDS.time(), self.open() as stream:
+                return self._parse_stream(LimitedReader(stream, settings.FB2_MAX_SIZE), image_handler)
+        except (InvalidBook, etree.XMLSyntaxError, zipfile.BadZipFile) as e:
+            raise InvalidBook(f"Ошибка при парсинге FB2: {str(e)}")
         except Exception as e:
             raise Exception(f"Ошибка при парсинге FB2: {str(e)}")
 
-    def _get_title(self, tree):
-        title_elem = tree.find('.//fb:book-title', self.ns)
+    @contextmanager
+    def open(self):
+        if not zipfile.is_zipfile(self.file_path):
+            with open(self.file_path, 'rb') as f:
+                yield f
+            return
+
+        with zipfile.ZipFile(self.file_path) as zf:
+            fb2_info = None
+            for info in zf.infolist():
+                if info.filename.endswith('.fb2'):
+                    fb2_info = info
+                    break
+            if fb2_info is None:
+                raise InvalidBook("В архиве не найден FB2 файл")
+            if fb2_info.file_size > settings.FB2_MAX_SIZE:
+                raise InvalidBook("Файл книги превышает допустимый размер")
+            with zf.open(fb2_info) as f:
+                yield f
+
+    def _parse_stream(self, stream, image_handler=None):
+        title = 'Без названия'
+        author = 'Неизвестный автор'
+        cover_href = None
+        cover_data = None
+
+        renderer = FB2Renderer()
+        blocks = []
+        notes = {}
+        images = {}
+        body_count = 0
+        in_body = False
+        in_notes = False
+        section_depth = 0
+        section_start = False
+        heading_count = 0
+        block_root = None
+        note_root = None
+        pending_images = []
+
+        context = etree.iterparse(
+            stream,
+            events=('start', 'end'),
+            resolve_entities=False,
+            load_dtd=False,
+            no_network=True,
+            huge_tree=False,
+            remove_comments=True,
+            remove_pis=True,
+        )
+
+        for event, elem in context:
+            if block_root is not None and elem is not block_root:
+                continue
+
+            tag = etree.QName(elem).localname if isinstance(elem.tag, str) else None
+
+            if event == 'start':
+                if tag == 'body':
+                    body_count += 1
+                    in_body = body_count == 1
+                    in_notes = not in_body
+                elif tag == 'section' and in_body:
+                    section_depth += 1
+                    section_start = True
+                elif tag == 'section' and in_notes and note_root is None:
+                    note_root = elem
+                elif tag in FB2Renderer.BLOCK_TAGS and in_body:
+                    block_root = elem
+                continue
+
+            if elem is block_root:
+                block_root = None
+                if tag != 'title' or section_depth:
+                    heading = section_depth if tag == 'title' else 0
+                    if self._is_image_only(renderer, elem, tag):
+                        html, _ = renderer.render(elem, min(section_depth + 1, 6))
+                        if html:
+                            pending_images.append(html)
+                    else:
+                        attrs = f' id="toc-{heading_count}"' if heading else ''
+                        html, text = renderer.render(elem, min(section_depth + 1, 6), f'{attrs} data-b="{len(blocks)}"')
+                        if html:
+                            blocks.append({
+                                'html': html,
+                                'text': text,
+                                'section': section_start,
+                                'heading': heading,
+                                'notes': renderer.pop_note_refs(),
+                                'images': pending_images,
+                            })
+                            pending_images = []
+                            section_start = False
+                            if heading:
+                                heading_count += 1
+            elif tag == 'description':
+                title = self._get_title(elem)
+                author = self._get_author(elem)
+                cover_href = self._get_cover_href(elem)
+            elif tag == 'section' and in_body:
+                section_depth -= 1
+            elif tag == 'section' and in_notes:
+                if elem.get('id'):
+                    notes[elem.get('id')] = renderer.render_note(elem)
+                if elem is not note_root:
+                    continue
+                note_root = None
+            elif tag == 'body':
+                in_body = False
+                in_notes = False
+            elif tag == 'binary':
+                binary_id = elem.get('id')
+                if cover_data is None and cover_href and binary_id == cover_href:
+                    cover_data = self._get_cover(elem.text)
+                if image_handler is not None and binary_id in renderer.image_refs:
+                    image = self._store_image(elem.text, image_handler)
+                    if image:
+                        images[binary_id] = image
+            else:
+                continue
+
+            self._release(elem)
+
+        if blocks:
+            blocks[-1]['trailing_images'] = pending_images
+
+        for block in blocks:
+            leading = self._resolve_image_blocks(renderer, block.pop('images'), images)
+            trailing = self._resolve_image_blocks(renderer, block.pop('trailing_images', []), images)
+            html = renderer.resolve_images(block['html'], images) if renderer.image_refs else block['html']
+            block['html'] = '\n'.join(leading + [html] + trailing)
+
+        if renderer.image_refs:
+            for note_id, html in notes.items():
+                notes[note_id] = renderer.resolve_images(html, images)
+
+        return {
+            'title': title,
+            'author': author,
+            'cover': cover_data,
+            'blocks': blocks,
+            'notes': notes,
+        }
+
+    @staticmethod
+    def _is_image_only(renderer, elem, tag):
+        if tag in ('table', 'empty-line'):
+            return False
+        return not ''.join(elem.itertext()).strip() and renderer.has_image(elem)
+
+    @staticmethod
+    def _resolve_image_blocks(renderer, fragments, images):
+        resolved = []
+        for html in fragments:
+            html = renderer.resolve_images(html, images)
+            if '<img ' in html:
+                resolved.append(html)
+        return resolved
+
+    def _release(self, elem):
+        elem.clear(keep_tail=False)
+        parent = elem.getparent()
+        if parent is None:
+            return
+        while elem.getprevious() is not None:
+            del parent[0]
+
+    def _get_title(self, description):
+        title_elem = description.find('.//fb:book-title', self.ns)
         if title_elem is not None and title_elem.text:
             return title_elem.text.strip()
         return 'Без названия'
 
-    def _get_author(self, tree):
-        first_name = tree.find('.//fb:author/fb:first-name', self.ns)
-        last_name = tree.find('.//fb:author/fb:last-name', self.ns)
-        middle_name = tree.find('.//fb:author/fb:middle-name', self.ns)
+    def _get_author(self, description):
+        first_name = description.find('.//fb:author/fb:first-name', self.ns)
+        last_name = description.find('.//fb:author/fb:last-name', self.ns)
+        middle_name = description.find('.//fb:author/fb:middle-name', self.ns)
 
         author_parts = []
         if first_name is not None and first_name.text:
@@ -64,57 +238,33 @@ class FB2Parser:
 
         return ' '.join(author_parts) if author_parts else 'Неизвестный автор'
 
-    def _get_cover(self, tree):
-        coverpage = tree.find('.//fb:coverpage/fb:image', self.ns)
+    def _get_cover_href(self, description):
+        coverpage = description.find('.//fb:coverpage/fb:image', self.ns)
         if coverpage is None:
             return None
 
-        href = coverpage.get('{http://www.w3.org/1999/xlink}href')
+        href = coverpage.get(XLINK_HREF)
         if not href:
             return None
 
-        href = href.lstrip('#')
+        return href.lstrip('#')
 
-        binary = tree.find(f'.//fb:binary[@id="{href}"]', self.ns)
-        if binary is None or not binary.text:
+    def _get_cover(self, binary_text):
+        if not binary_text or len(binary_text) > settings.FB2_MAX_BINARY_SIZE:
             return None
 
         try:
-            image_data = base64.b64decode(binary.text.strip())
-            image = Image.open(BytesIO(image_data))
-
-            max_size = (400, 600)
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-            output = BytesIO()
-            image_format = image.format if image.format else 'JPEG'
-            image.save(output, format=image_format)
-            output.seek(0)
-
-            return ContentFile(output.read(), name='cover.jpg')
+            image_data = base64.b64decode(binary_text.strip())
+            Image.open(BytesIO(image_data)).verify()
+            return image_data
         except Exception:
             return None
 
-    def _get_text(self, tree):
-        body = tree.find('.//fb:body', self.ns)
-        if body is None:
-            return ''
-
-        sections = []
-        for section in body.findall('.//fb:section', self.ns):
-            section_text = self._extract_section_text(section)
-            if section_text:
-                sections.append(section_text)
-
-        return '\n\n'.join(sections)
-
-    def _extract_section_text(self, section):
-        texts = []
-
-        for elem in section.iter():
-            if elem.tag in ['{http://www.gribuser.ru/xml/fictionbook/2.0}p',
-                           '{http://www.gribuser.ru/xml/fictionbook/2.0}title']:
-                if elem.text:
-                    texts.append(elem.text.strip())
+    def _store_image(self, binary_text, image_handler):
+        if not binary_text or len(binary_text) > settings.FB2_MAX_BINARY_SIZE:
+            return None
 
-        return '\n'.join(texts)
+        try:
+            return image_handler(base64.b64decode(binary_text.strip()))
+        except Exception:
+            return None
@@ -0,0 +1,206 @@
+import re
+from html import unescape
+from django.utils.html import escape
+from lxml import etree
+
+
+XLINK_HREF = '{http://www.w3.org/1999/xlink}href'
+IMAGE_PLACEHOLDER = re.compile(r'<!--fb-image:([^>]*?)-->')
+
+
+class FB2Renderer:
+
+    INLINE_TAGS = {
+        'emphasis': 'em',
+        'strong': 'strong',
+        'strikethrough': 's',
+        'sub': 'sub',
+        'sup': 'sup',
+        'code': 'code',
+        'style': 'span',
+    }
+    TEXT_TAGS = {
+        'p': None,
+        'v': 'fb-verse',
+        'subtitle': 'fb-subtitle',
+        'text-author': 'fb-text-author',
+    }
+    CONTAINER_TAGS = {
+        'epigraph': ('blockquote', 'fb-epigraph'),
+        'cite': ('blockquote', 'fb-cite'),
+        'poem': ('div', 'fb-poem'),
+        'stanza': ('div', 'fb-stanza'),
+        'annotation': ('div', 'fb-annotation'),
+    }
+    BLOCK_TAGS = frozenset(TEXT_TAGS) | frozenset(CONTAINER_TAGS) | frozenset(['title', 'empty-line', 'table', 'image'])
+
+    def __init__(self):
+        self.note_refs = []
+        self.image_refs = set()
+
+    @staticmethod
+    def localname(elem):
+        return etree.QName(elem).localname if isinstance(elem.tag, str) else None
+
+    def pop_note_refs(self):
+        refs, self.note_refs = self.note_refs, []
+        return refs
+
+    def render(self, elem, level, attrs=''):
+        tag = self.localname(elem)
+
+        if tag in self.TEXT_TAGS:
+            text = ''.join(elem.itertext()).strip()
+            if not text and not self.has_image(elem):
+                return '', ''
+            css_class = self.TEXT_TAGS[tag]
+            class_attr = f' class="{css_class}"' if css_class else ''
+            return f'<p{attrs}{class_attr}>{self.inline(elem)}</p>', text
+
+        if tag == 'title':
+            return self.render_title(elem, level, attrs)
+
+        if tag == 'empty-line':
+            return f'<p{attrs} class="fb-empty"></p>', ''
+
+        if tag == 'table':
+            return self.render_table(elem, attrs)
+
+        if tag == 'image':
+            placeholder = self.image_placeholder(elem)
+            if not placeholder:
+                return '', ''
+            return f'<div{attrs} class="fb-image">{placeholder}</div>', ''
+
+        if tag in self.CONTAINER_TAGS:
+            html, text = self.render_children(elem, min(level + 1, 6) if level else 0)
+            if not html:
+                return '', ''
+            wrapper, css_class = self.CONTAINER_TAGS[tag]
+            return f'<{wrapper}{attrs} class="{css_class}">\n{html}\n</{wrapper}>', text
+
+        html, text = self.render_children(elem, level)
+        if not html:
+            return '', ''
+        return f'<div{attrs}>\n{html}\n</div>', text
+
+    def render_children(self, elem, level):
+        parts = []
+        texts = []
+        for child in elem:
+            html, text = self.render(child, level)
+            if html:
+                parts.append(html)
+                texts.append(text)
+        return '\n'.join(parts), '\n'.join(texts)
+
+    def render_title(self, elem, level, attrs=''):
+        lines = []
+        texts = []
+        for child in elem:
+            if self.localname(child) not in ('p', 'subtitle'):
+                continue
+            text = ''.join(child.itertext()).strip()
+            if text:
+                lines.append(self.inline(child))
+                texts.append(text)
+
+        if not lines:
+            return '', ''
+        html = '<br>\n'.join(lines)
+        if not level:
+            return f'<p{attrs} class="fb-note-title">{html}</p>', '\n'.join(texts)
+        return f'<h{level}{attrs} class="fb-title">{html}</h{level}>', '\n'.join(texts)
+
+    def render_table(self, elem, attrs=''):
+        rows = []
+        texts = []
+        for row in elem:
+            if self.localname(row) != 'tr':
+                continue
+            cells = []
+            for cell in row:
+                tag = self.localname(cell)
+                if tag not in ('td', 'th'):
+                    continue
+                cells.append(f'<{tag}>{self.inline(cell)}</{tag}>')
+                texts.append(''.join(cell.itertext()).strip())
+            rows.append('<tr>' + '\n'.join(cells) + '</tr>')
+
+        if not rows:
+            return '', ''
+        return f'<table{attrs} class="fb-table">\n' + '\n'.join(rows) + '\n</table>', '\n'.join(texts)
+
+    def render_note(self, elem):
+        html, _ = self.render_children(elem, 0)
+        self.note_refs = []
+        return html
+
+    def has_image(self, elem):
+        return any(self.localname(child) == 'image' for child in elem.iter())
+
+    def image_placeholder(self, elem):
+        href = elem.get(XLINK_HREF) or ''
+        if not href.startswith('#') or len(href) < 2:
+            return ''
+        self.image_refs.add(href[1:])
+        return f'<!--fb-image:{escape(href[1:])}-->'
+
+    @staticmethod
+    def image_tag(image):
+        if not image:
+            return ''
+        return (
+            f'<img src="{escape(image["url"])}" width="{image["width"]}" height="{image["height"]}" '
+            'loading="lazy" decoding="async" alt="">'
+        )
+
+    @classmethod
+    def resolve_images(cls, html, images):
+        if '<!--fb-image:' not in html:
+            return html
+        html = IMAGE_PLACEHOLDER.sub(lambda match: cls.image_tag(images.get(unescape(match.group(1)))), html)
+        return html.replace('<div class="fb-image"></div>', '')
+
+    def inline(self, elem):
+        parts = []
+        self._inline(elem, parts)
+        return ''.join(parts)
+
+    def _inline(self, elem, parts):
+        if elem.text:
+            parts.append(escape(elem.text))
+
+        for child in elem:
+            tag = self.localname(child)
+            if tag in self.INLINE_TAGS:
+                wrapper = self.INLINE_TAGS[tag]
+                parts.append(f'<{wrapper}>')
+                self._inline(child, parts)
+                parts.append(f'</{wrapper}>')
+            elif tag == 'a':
+                self._link(child, parts)
+            elif tag == 'image':
+                parts.append(self.image_placeholder(child))
+            elif tag is not None:
+                self._inline(child, parts)
+
+            if child.tail:
+                parts.append(escape(child.tail))
+
+    def _link(self, elem, parts):
+        href = elem.get(XLINK_HREF) or ''
+        if href.startswith('#') and len(href) > 1:
+            note_id = href[1:]
+            self.note_refs.append(note_id)
+            parts.append(f'<a class="fb-note-ref" href="#note-{escape(note_id)}">')
+            closing = '</a>'
+        elif href.startswith(('http://', 'https://')):
+            parts.append(f'<a href="{escape(href)}" target="_blank" rel="noopener noreferrer nofollow">')
+            closing = '</a>'
+        else:
+            parts.append('<span>')
+            closing = '</span>'
+
+        self._inline(elem, parts)
+        parts.append(closing)
@@ -1,101 +1,264 @@
+import json
+import httpx
 import requests
 from lxml import html
 import os
 from django.conf import settings
+from django.utils.text import get_valid_filename
+from .fb2_parser import InvalidBook
+from .metrics import Metrics
+from .mirror_pool import MirrorPool
+from .tor_session import AsyncTorClientPool, TorSessionPool
+
+
+class DownloadInterrupted(Exception):
+    pass
 
 
 class FlibustaService:
 
     def __init__(self):
-        self.flibusta_onion = settings.FLIBUSTA_ONION
-        self.tor_proxy = {
-            'http': f'socks5h://{settings.TOR_PROXY_HOST}:{settings.TOR_PROXY_PORT}',
-            'https': f'socks5h://{settings.TOR_PROXY_HOST}:{settings.TOR_PROXY_PORT}'
-        }
-        self.session = requests.Session()
-        self.session.proxies.update(self.tor_proxy)
+        self.session = TorSessionPool.get_session()
 
     def search(self, query):
         if not query or not query.strip():
             return []
 
         try:
-            search_url = f"{self.flibusta_onion}/booksearch"
             params = {'ask': query.strip()}
 
-            response = self.session.get(search_url, params=params, timeout=30)
-            response.raise_for_status()
+            def request(mirror):
+                response = self.session.get(f"{mirror}/booksearch", params=params, timeout=30)
+                response.raise_for_status()
+                return self.parse_search_results(response.content, mirror)
 
-            tree = html.fromstring(response.content)
+            with Metrics.timed(Metrics.FLIBUSTA_SECONDS, operation='search'):
+                try:
+                    return MirrorPool.hedge(request)
+                except (requests.ConnectionError, requests.Timeout):
+                    TorSessionPool.recycle(self.session)
+                    raise
 
-            results = []
-            book_links = tree.xpath('//ul/li/a[contains(@href, "/b/")]')
+        except Exception as e:
+            raise Exception(f"Ошибка поиска на Флибусте: {str(e)}")
 
-            for link in book_links[:20]:
-                title_text = link.text_content().strip()
-                href = link.get('href')
+    @staticmethod
+    def parse_search_results(content, base_url):
+        tree = html.fromstring(content)
 
-                if not href or not title_text:
-                    continue
+        results = []
+        book_links = tree.xpath('//ul/li/a[contains(@href, "/b/")]')
 
-                book_id = href.split('/b/')[-1].split('/')[0]
+        for link in book_links[:20]:
+            title_text = link.text_content().strip()
+            href = link.get('href')
 
-                author = 'Неизвестный автор'
-                title = title_text
+            if not href or not title_text:
+                continue
 
-                parent = link.getparent()
-                if parent is not None:
-                    full_text = parent.text_content().strip()
+            book_id = href.split('/b/')[-1].split('/')[0]
 
-                    for separator in [' — ', ' - ', ': ', '—', ' – ']:
-                        if separator in full_text:
-                            parts = full_text.split(separator, 1)
-                            potential_author = parts[0].strip()
-                            potential_title = parts[1].strip() if len(parts) > 1 else title_text
+            author = 'Неизвестный автор'
+            title = title_text
 
-                            if len(potential_author) > 0 and len(potential_author) < 100:
-                                author = potential_author
-                                title = potential_title
-                                break
+            parent = link.getparent()
+            if parent is not None:
+                full_text = parent.text_content().strip()
 
-                results.append({
-                    'id': book_id,
-                    'title': title,
-                    'author': author,
-                    'url': f"{self.flibusta_onion}{href}"
-                })
+                for separator in [' — ', ' - ', ': ', '—', ' – ']:
+                    if separator in full_text:
+                        parts = full_text.split(separator, 1)
+                        potential_author = parts[0].strip()
+                        potential_title = parts[1].strip() if len(parts) > 1 else title_text
 
-            return results
+                        if len(potential_author) > 0 and len(potential_author) < 100:
+                            author = potential_author
+                            title = potential_title
+                            break
 
-        except Exception as e:
-            raise Exception(f"Ошибка поиска на Флибусте: {str(e)}")
+            results.append({
+                'id': book_id,
+                'title': title,
+                'author': author,
+                'url': f"{base_url}{href}"
+            })
+
+        return results
+
+    @staticmethod
+    def download_key(book_id, job_id=None):
+        safe_id = get_valid_filename(str(book_id))
+        return f'{safe_id}.{job_id}' if job_id else safe_id
 
-    def download_book(self, book_id):
+    @classmethod
+    def part_path(cls, book_id, job_id=None):
+        return os.path.join(settings.DOWNLOAD_ROOT, f'book_{cls.download_key(book_id, job_id)}.part')
+
+    @classmethod
+    def discard_part(cls, book_id, job_id=None):
+        cls._discard(cls.part_path(book_id, job_id))
+
+    def download_book(self, book_id, job_id=None, heartbeat=None):
         try:
-            download_url = f"{self.flibusta_onion}/b/{book_id}/fb2"
+            download_path = f"/b/{book_id}/fb2"
+            safe_id = get_valid_filename(str(book_id))
+            key = self.download_key(book_id, job_id)
 
-            response = self.session.get(download_url, timeout=60)
-            response.raise_for_status()
+            download_dir = settings.DOWNLOAD_ROOT
+            os.makedirs(download_dir, exist_ok=True)
+            part_path = self.part_path(book_id, job_id)
 
-            if 'application' not in response.headers.get('Content-Type', ''):
-                raise Exception("Некорректный тип контента. Книга может быть недоступна.")
+            attempts = settings.FLIBUSTA_DOWNLOAD_RESUME_ATTEMPTS
+            with Metrics.timed(Metrics.FLIBUSTA_SECONDS, operation='download'):
+                for attempt in range(attempts + 1):
+                    try:
+                        headers = self._fetch_to_part(download_path, part_path, heartbeat)
+                        break
+                    except DownloadInterrupted:
+                        if attempt == attempts:
+                            raise Exception("Соединение прервано, загрузка будет продолжена при повторе")
 
-            filename = f"book_{book_id}.fb2"
+            filename = self._get_filename(headers, safe_id)
+            final_path = os.path.join(download_dir, f'{key}_{filename}')
+            os.replace(part_path, final_path)
+            self._discard(part_path)
+            return final_path
 
-            content_disposition = response.headers.get('Content-Disposition', '')
-            if 'filename=' in content_disposition:
+        except InvalidBook as e:
+            raise InvalidBook(f"Ошибка скачивания книги: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Ошибка скачивания книги: {str(e)}")
+
+    @staticmethod
+    def _validator(headers):
+        etag = headers.get('ETag', '')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return headers.get('Last-Modified', '')
+
+    def _read_part_meta(self, part_path):
+        try:
+            with open(f'{part_path}.json') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not meta.get('validator') or meta.get('mirror') not in MirrorPool.mirrors():
+            return None
+        return meta
+
+    def _fetch_to_part(self, download_path, part_path, heartbeat=None):
+        max_size = settings.FLIBUSTA_MAX_DOWNLOAD_SIZE
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        meta = self._read_part_meta(part_path) if offset else None
+        if offset and meta is None:
+            self._discard(part_path)
+            offset = 0
+        headers = {'Range': f'bytes={offset}-', 'If-Range': meta['validator']} if offset else {}
+
+        def request(mirror):
+            response = self.session.get(f"{mirror}{download_path}", headers=headers, stream=True, timeout=(30, 60))
+            if response.status_code != 416 and not response.ok:
+                response.close()
+                response.raise_for_status()
+            response.mirror = mirror
+            return response
+
+        try:
+            if meta is not None:
                 try:
-                    filename = content_disposition.split('filename=')[1].strip('"')
-                except:
-                    pass
+                    response = MirrorPool._call(request, meta['mirror'])
+                except requests.HTTPError:
+                    self._discard(part_path)
+                    raise DownloadInterrupted()
+            else:
+                response = MirrorPool.hedge(request, release=lambda response: response.close())
+
+            with response:
+                if response.status_code == 416:
+                    self._discard(part_path)
+                    raise DownloadInterrupted()
+
+                if 'application' not in response.headers.get('Content-Type', ''):
+                    self._discard(part_path)
+                    raise Exception("Некорректный тип контента. Книга может быть недоступна.")
+
+                if response.status_code != 206:
+                    offset = 0
+                    with open(f'{part_path}.json', 'w') as f:
+                        json.dump({'mirror': response.mirror, 'validator': self._validator(response.headers)}, f)
 
-            temp_path = os.path.join(settings.MEDIA_ROOT, 'books', filename)
-            os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+                content_length = int(response.headers.get('Content-Length') or 0)
+                expected_size = offset + content_length if content_length else None
+                if expected_size and expected_size > max_size:
+                    self._discard(part_path)
+                    raise InvalidBook("Файл книги превышает допустимый размер")
 
-            with open(temp_path, 'wb') as f:
-                f.write(response.content)
+                written = offset
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    for block in response.iter_content(chunk_size=64 * 1024):
+                        written += len(block)
+                        if written > max_size:
+                            break
+                        f.write(block)
+                        if heartbeat:
+                            heartbeat()
 
-            return temp_path
+                if written > max_size:
+                    self._discard(part_path)
+                    raise InvalidBook("Файл книги превышает допустимый размер")
+
+                if expected_size and written < expected_size:
+                    raise DownloadInterrupted()
+
+                return response.headers
+
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+            TorSessionPool.recycle(self.session)
+            self.session = TorSessionPool.get_session()
+            raise DownloadInterrupted()
+
+    def _get_filename(self, headers, safe_id):
+        filename = f"book_{safe_id}.fb2"
+
+        content_disposition = headers.get('Content-Disposition', '')
+        if 'filename=' in content_disposition:
+            try:
+                filename = content_disposition.split('filename=')[1].split(';')[0].strip().strip('"')
+            except:
+                pass
+
+        return get_valid_filename(os.path.basename(filename)) or f"book_{safe_id}.fb2"
+
+    @staticmethod
+    def _discard(path):
+        for name in (path, f'{path}.json'):
+            if os.path.exists(name):
+                os.remove(name)
+
+
+class AsyncFlibustaService:
+
+    def __init__(self):
+        self.client = AsyncTorClientPool.get_client()
+
+    async def search(self, query):
+        if not query or not query.strip():
+            return []
+
+        try:
+            params = {'ask': query.strip()}
+
+            async def request(mirror):
+                response = await self.client.get(f"{mirror}/booksearch", params=params, timeout=30)
+                response.raise_for_status()
+                return FlibustaService.parse_search_results(response.content, mirror)
+
+            with Metrics.timed(Metrics.FLIBUSTA_SECONDS, operation='search'):
+                try:
+                    return await MirrorPool.ahedge(request)
+                except httpx.TransportError:
+                    await AsyncTorClientPool.recycle(self.client)
+                    raise
 
         except Exception as e:
-            raise Exception(f"Ошибка скачивания книги: {str(e)}")
+            raise Exception(f"Ошибка поиска на Флибусте: {str(e)}")
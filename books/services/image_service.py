@@ -0,0 +1,76 @@
+import hashlib
+from io import BytesIO
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+
+class ImageService:
+
+    EXTENSIONS = {
+        'JPEG': 'jpg',
+        'PNG': 'png',
+        'GIF': 'gif',
+        'WEBP': 'webp',
+    }
+    SAVE_OPTIONS = {
+        'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+        'PNG': {'optimize': True},
+        'WEBP': {'quality': 80, 'method': 4},
+    }
+
+    @staticmethod
+    def target_size(width, height):
+        max_size = settings.BOOK_IMAGE_MAX_SIZE
+        if max(width, height) <= max_size:
+            return width, height
+        scale = max_size / max(width, height)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    @classmethod
+    def store(cls, image_data):
+        try:
+            image = Image.open(BytesIO(image_data))
+            pil_format = image.format if image.format in cls.EXTENSIONS else 'PNG'
+            if getattr(image, 'is_animated', False):
+                width, height = image.size
+            else:
+                width, height = cls.target_size(*image.size)
+        except Exception as e:
+            raise Exception(f"Ошибка обработки иллюстрации: {str(e)}")
+
+        digest = hashlib.sha256(image_data).hexdigest()[:32]
+        name = f'images/{digest[:2]}/{digest}.{cls.EXTENSIONS[pil_format]}'
+
+        if not default_storage.exists(name):
+            if (width, height) != image.size or pil_format != image.format:
+                if (width, height) != image.size:
+                    if image.mode in ('P', '1'):
+                        image = image.convert('RGBA')
+                    image = image.resize((width, height), Image.Resampling.LANCZOS)
+                if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                output = BytesIO()
+                image.save(output, format=pil_format, **cls.SAVE_OPTIONS.get(pil_format, {}))
+                image_data = output.getvalue()
+
+            saved_name = default_storage.save(name, ContentFile(image_data))
+            if saved_name != name:
+                default_storage.delete(saved_name)
+
+        return {
+            'url': default_storage.url(name),
+            'width': width,
+            'height': height,
+        }
+
+    @staticmethod
+    def delete(urls):
+        prefix = default_storage.url('images/')
+        for url in urls:
+            if not url.startswith(prefix):
+                continue
+            name = f'images/{url[len(prefix):]}'
+            if default_storage.exists(name):
+                default_storage.delete(name)
@@ -0,0 +1,59 @@
+import os
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from ..models import Book
+from .artifact_service import ArtifactService
+from .book_storage import BookStorageService
+from .cover_service import CoverService
+from .reading_service import ReadingService
+
+
+class IngestService:
+
+    @staticmethod
+    def ingest(file_path, flibusta_id=None, title='Без названия', author='Неизвестный автор'):
+        try:
+            content_hash = ArtifactService.compute_hash(file_path)
+            existing = Book.objects.filter(content_hash=content_hash).first()
+            if existing is not None:
+                if flibusta_id and not existing.flibusta_id and not Book.objects.filter(flibusta_id=flibusta_id).exists():
+                    existing.flibusta_id = flibusta_id
+                    existing.save(update_fields=['flibusta_id', 'updated_at'])
+                return existing
+
+            content_hash, book_data = ArtifactService.build(file_path, content_hash)
+
+            book = Book()
+            book.title = book_data.get('title', title)
+            book.author = book_data.get('author', author)
+            book.flibusta_id = flibusta_id
+            book.content_hash = content_hash
+
+            BookStorageService.save(book, file_path, content_hash)
+
+            if book_data.get('cover'):
+                try:
+                    CoverService.apply(book, book_data['cover'])
+                except Exception:
+                    pass
+
+            try:
+                with transaction.atomic():
+                    book.save()
+            except IntegrityError:
+                lookup = Q(content_hash=content_hash)
+                if flibusta_id:
+                    lookup |= Q(flibusta_id=flibusta_id)
+                existing = Book.objects.filter(lookup).first()
+                if existing is None:
+                    raise
+                return existing
+
+            try:
+                ReadingService.prerender(book)
+            except Exception:
+                pass
+            return book
+        finally:
+            if os.path.exists(file_path):
+                os.remove(file_path)
@@ -0,0 +1,44 @@
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from ..models import Book
+
+
+class LibraryService:
+
+    EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def encode_cursor(cls, book):
+        delta = book.created_at - cls.EPOCH
+        microseconds = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+        return f'{microseconds}-{book.id.hex}'
+
+    @classmethod
+    def decode_cursor(cls, cursor):
+        try:
+            microseconds, book_id = cursor.split('-', 1)
+            return cls.EPOCH + timedelta(microseconds=int(microseconds)), uuid.UUID(hex=book_id)
+        except (AttributeError, ValueError):
+            return None
+
+    @staticmethod
+    def stamp():
+        return Book.objects.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+
+    @classmethod
+    def get_page(cls, cursor=None, page_size=None):
+        page_size = page_size or settings.LIBRARY_PAGE_SIZE
+        books = Book.objects.order_by('-created_at', '-id')
+
+        position = cls.decode_cursor(cursor) if cursor else None
+        if position is not None:
+            created_at, book_id = position
+            books = books.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=book_id)
+            )
+
+        page = list(books[:page_size + 1])
+        next_cursor = cls.encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+        return page[:page_size], next_cursor
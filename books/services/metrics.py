@@ -0,0 +1,131 @@
+import glob
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+
+
+class SharedMultiProcessCollector(multiprocess.MultiProcessCollector):
+
+    def __init__(self, registry, directories):
+        self.directories = directories
+        registry.register(self)
+
+    def collect(self):
+        files = []
+        for directory in self.directories:
+            files.extend(glob.glob(os.path.join(directory, '*.db')))
+        return self.merge(files, accumulate=True)
+
+
+class Metrics:
+
+    FLIBUSTA_SECONDS = Histogram(
+        'flibusta_request_seconds',
+        'Длительность запросов к Флибусте',
+        ['operation', 'outcome'],
+        buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300),
+    )
+    PARSE_SECONDS = Histogram(
+        'fb2_parse_seconds',
+        'Длительность разбора FB2',
+        buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+    )
+    PARSE_INPUT_BYTES = Histogram(
+        'fb2_parse_input_bytes',
+        'Размер разбираемого FB2 файла',
+        buckets=(64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024, 64 * 1024 * 1024),
+    )
+    COVER_SECONDS = Histogram(
+        'cover_process_seconds',
+        'Длительность обработки обложки',
+        buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+    )
+    VIEW_SECONDS = Histogram(
+        'django_view_seconds',
+        'Время ответа представления',
+        ['view', 'method', 'status'],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+    VIEW_DB_QUERIES = Histogram(
+        'django_view_db_queries',
+        'Число SQL запросов на ответ',
+        ['view'],
+        buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+    )
+    VIEW_DB_SECONDS = Histogram(
+        'django_view_db_seconds',
+        'Суммарное время SQL запросов на ответ',
+        ['view'],
+        buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+    )
+    CACHE_REQUESTS = Counter(
+        'cache_requests',
+        'Обращения к кэшам',
+        ['cache', 'result'],
+    )
+
+    db_stats = ContextVar('metrics_db_stats', default=None)
+
+    @staticmethod
+    @contextmanager
+    def timed(histogram, **labels):
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'success'
+        finally:
+            histogram.labels(outcome=outcome, **labels).observe(time.perf_counter() - started)
+
+    @classmethod
+    def cache_result(cls, cache, result):
+        cls.CACHE_REQUESTS.labels(cache, result).inc()
+
+    @classmethod
+    def execute_wrapper(cls, execute, sql, params, many, context):
+        stats = cls.db_stats.get()
+        if stats is None:
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stats[0] += 1
+            stats[1] += time.perf_counter() - started
+
+    @classmethod
+    def install(cls, connection):
+        if cls.execute_wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(cls.execute_wrapper)
+
+    @classmethod
+    def start_request(cls):
+        return cls.db_stats.set([0, 0.0]), time.perf_counter()
+
+    @classmethod
+    def finish_request(cls, request, response, token, started):
+        elapsed = time.perf_counter() - started
+        queries, query_seconds = cls.db_stats.get()
+        cls.db_stats.reset(token)
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        status = response.status_code if response is not None else 500
+
+        cls.VIEW_SECONDS.labels(view, request.method, status).observe(elapsed)
+        cls.VIEW_DB_QUERIES.labels(view).observe(queries)
+        cls.VIEW_DB_SECONDS.labels(view).observe(query_seconds)
+
+    @staticmethod
+    def render():
+        path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+        if path:
+            registry = CollectorRegistry()
+            SharedMultiProcessCollector(registry, [path, *settings.METRICS_SHARED_DIRS])
+        else:
+            registry = REGISTRY
+        return generate_latest(registry)
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from django.conf import settings
+
+
+class MirrorPool:
+
+    _lock = threading.Lock()
+    _stats = {}
+
+    @staticmethod
+    def mirrors():
+        mirrors = [mirror.strip().rstrip('/') for mirror in settings.FLIBUSTA_MIRRORS if mirror.strip()]
+        return mirrors or [settings.FLIBUSTA_ONION.rstrip('/')]
+
+    @classmethod
+    def score(cls, mirror):
+        stats = cls._stats.get(mirror)
+        if stats is None:
+            return settings.FLIBUSTA_HEDGE_DELAY
+        return stats['latency'] + stats['errors'] * settings.FLIBUSTA_MIRROR_ERROR_PENALTY
+
+    @classmethod
+    def ordered(cls):
+        with cls._lock:
+            return sorted(cls.mirrors(), key=cls.score)
+
+    @classmethod
+    def record_success(cls, mirror, latency):
+        with cls._lock:
+            stats = cls._stats.get(mirror)
+            if stats is None:
+                cls._stats[mirror] = {'latency': latency, 'errors': 0, 'requests': 1, 'failures': 0}
+                return
+            stats['latency'] = stats['latency'] * 0.7 + latency * 0.3
+            stats['errors'] = 0
+            stats['requests'] += 1
+
+    @classmethod
+    def record_failure(cls, mirror):
+        with cls._lock:
+            stats = cls._stats.setdefault(mirror, {
+                'latency': settings.FLIBUSTA_HEDGE_DELAY, 'errors': 0, 'requests': 0, 'failures': 0
+            })
+            stats['errors'] += 1
+            stats['requests'] += 1
+            stats['failures'] += 1
+
+    @classmethod
+    def snapshot(cls):
+        with cls._lock:
+            return {mirror: dict(stats) for mirror, stats in cls._stats.items()}
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._stats.clear()
+
+    @classmethod
+    def _call(cls, request, mirror):
+        started = time.monotonic()
+        try:
+            result = request(mirror)
+        except Exception:
+            cls.record_failure(mirror)
+            raise
+        cls.record_success(mirror, time.monotonic() - started)
+        return result
+
+    @classmethod
+    async def _acall(cls, request, mirror):
+        started = time.monotonic()
+        try:
+            result = await request(mirror)
+        except Exception:
+            cls.record_failure(mirror)
+            raise
+        cls.record_success(mirror, time.monotonic() - started)
+        return result
+
+    @classmethod
+    def hedge(cls, request, release=None):
+        queue = cls.ordered()
+        executor = ThreadPoolExecutor(max_workers=len(queue))
+        pending = {executor.submit(cls._call, request, queue.pop(0))}
+        error = None
+        winner = None
+
+        try:
+            while pending and winner is None:
+                done, pending = wait(pending, timeout=settings.FLIBUSTA_HEDGE_DELAY if queue else None, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is not None:
+                        error = future.exception()
+                    elif winner is None:
+                        winner = future
+                    elif release is not None:
+                        release(future.result())
+
+                if winner is None and queue:
+                    pending.add(executor.submit(cls._call, request, queue.pop(0)))
+        finally:
+            if release is not None:
+                for future in pending:
+                    future.add_done_callback(lambda f: not f.cancelled() and f.exception() is None and release(f.result()))
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if winner is None:
+            raise error
+        return winner.result()
+
+    @classmethod
+    async def ahedge(cls, request):
+        queue = cls.ordered()
+        pending = {asyncio.ensure_future(cls._acall(request, queue.pop(0)))}
+        error = None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=settings.FLIBUSTA_HEDGE_DELAY if queue else None, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+
+                if queue:
+                    pending.add(asyncio.ensure_future(cls._acall(request, queue.pop(0))))
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise error
@@ -0,0 +1,88 @@
+import atexit
+import os
+import threading
+import time
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from ..models import Book
+from .artifact_service import ArtifactService
+
+
+class ProgressBuffer:
+
+    _lock = threading.Lock()
+    _pending = {}
+    _pid = None
+    _last_flush = 0.0
+
+    @classmethod
+    def _ensure_flusher(cls):
+        if cls._pid == os.getpid():
+            return
+        cls._pid = os.getpid()
+        cls._pending = {}
+        threading.Thread(target=cls._run, daemon=True).start()
+
+    @classmethod
+    def _run(cls):
+        while True:
+            time.sleep(settings.PROGRESS_FLUSH_INTERVAL)
+            try:
+                cls.flush()
+            except Exception:
+                pass
+            finally:
+                connection.close()
+
+    @classmethod
+    def record(cls, book_id, block):
+        with cls._lock:
+            cls._ensure_flusher()
+            cls._pending[str(book_id)] = (block, timezone.now())
+            due = time.monotonic() - cls._last_flush >= settings.PROGRESS_FLUSH_INTERVAL
+        if due:
+            cls.flush()
+
+    @classmethod
+    def pending_block(cls, book_id, default=None):
+        with cls._lock:
+            entry = cls._pending.get(str(book_id))
+        return entry[0] if entry else default
+
+    @classmethod
+    def flush(cls):
+        with cls._lock:
+            pending, cls._pending = cls._pending, {}
+            cls._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            with transaction.atomic():
+                books = Book.objects.filter(id__in=pending.keys()).only('id', 'content_hash', 'reading_block', 'reading_progress', 'last_read')
+                changed = []
+                for book in books:
+                    block, read_at = pending[str(book.id)]
+                    if book.reading_block == block:
+                        continue
+                    artifact = ArtifactService.read(book.content_hash) if book.content_hash else None
+                    if artifact is not None:
+                        book.reading_progress = ArtifactService.block_progress(artifact, block)
+                    book.reading_block = block
+                    book.last_read = max(book.last_read, read_at) if book.last_read else read_at
+                    book.updated_at = read_at
+                    changed.append(book)
+
+                if changed:
+                    Book.objects.bulk_update(changed, ['reading_block', 'reading_progress', 'last_read', 'updated_at'])
+        except Exception:
+            with cls._lock:
+                for book_id, entry in pending.items():
+                    cls._pending.setdefault(book_id, entry)
+            raise
+
+        return len(changed)
+
+
+atexit.register(ProgressBuffer.flush)
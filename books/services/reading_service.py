@@ -1,5 +1,12 @@
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
 from ..models import Book
-from .fb2_parser import FB2Parser
+from .artifact_service import ArtifactService
+from .progress_buffer import ProgressBuffer
+from .render_service import RenderService
 
 
 class ReadingService:
@@ -8,28 +15,133 @@ class ReadingService:
     def get_book_text(book_id):
         try:
             book = Book.objects.get(id=book_id)
-            parser = FB2Parser(book.file.path)
-            data = parser.parse()
-            return data.get('text', '')
+            artifact = ArtifactService.load(book)
+            return ArtifactService.text(artifact)
         except Book.DoesNotExist:
             raise Exception("Книга не найдена")
         except Exception as e:
             raise Exception(f"Ошибка при чтении книги: {str(e)}")
 
     @staticmethod
-    def update_progress(book_id, progress):
+    def build_chunk(book, artifact, index, static):
+        chunks = artifact.get('chunks', [])
+        if index < 0 or index >= len(chunks):
+            raise Exception("Фрагмент книги не найден")
+
+        prev_index = index - 1 if index > 0 else None
+        next_index = index + 1 if index < len(chunks) - 1 else None
+        offsets = artifact['offsets']
+        end = offsets[index + 1] - 1 if next_index is not None else artifact['length']
+        notes = artifact.get('notes', {})
+        return {
+            'index': index,
+            'html': chunks[index],
+            'notes': [{'id': ref, 'html': notes[ref]} for ref in artifact['chunk_notes'][index]],
+            'offset': offsets[index],
+            'length': end - offsets[index],
+            'total': artifact['length'],
+            'count': len(chunks),
+            'prev': prev_index,
+            'next': next_index,
+            'prev_url': RenderService.chunk_url(book, prev_index, static) if prev_index is not None else None,
+            'next_url': RenderService.chunk_url(book, next_index, static) if next_index is not None else None,
+        }
+
+    @staticmethod
+    def get_chunk(book, index):
         try:
-            book = Book.objects.get(id=book_id)
-            progress_value = max(0, min(100, int(progress)))
-            book.reading_progress = progress_value
-            book.save(update_fields=['reading_progress'])
-            return True
-        except Book.DoesNotExist:
-            raise Exception("Книга не найдена")
-        except ValueError:
-            raise Exception("Некорректное значение прогресса")
+            artifact = ArtifactService.load(book)
+        except Exception as e:
+            raise Exception(f"Ошибка при чтении книги: {str(e)}")
+
+        return ReadingService.build_chunk(book, artifact, index, RenderService.is_rendered(book))
+
+    @staticmethod
+    def get_toc(book):
+        try:
+            artifact = ArtifactService.load(book)
+        except Exception as e:
+            raise Exception(f"Ошибка при чтении книги: {str(e)}")
+        return artifact.get('toc', [])
+
+    @staticmethod
+    def get_chapter(book, number):
+        try:
+            artifact = ArtifactService.load(book)
+        except Exception as e:
+            raise Exception(f"Ошибка при чтении книги: {str(e)}")
+
+        toc = artifact.get('toc', [])
+        if number < 0 or number >= len(toc):
+            raise Exception("Глава не найдена")
+        return ReadingService.build_chunk(book, artifact, toc[number]['chunk'], RenderService.is_rendered(book))
+
+    @staticmethod
+    def prerender(book, quality=None):
+        artifact = ArtifactService.load(book)
+        chunks = (
+            ReadingService.build_chunk(book, artifact, index, True)
+            for index in range(len(artifact.get('chunks', [])))
+        )
+        return RenderService.write(book, chunks, quality)
+
+    @staticmethod
+    def get_initial_chunk(book):
+        try:
+            artifact = ArtifactService.load(book)
         except Exception as e:
-            raise Exception(f"Ошибка при обновлении прогресса: {str(e)}")
+            raise Exception(f"Ошибка при чтении книги: {str(e)}")
+
+        if book.reading_block is None:
+            block = ArtifactService.block_at(artifact, artifact['length'] * book.reading_progress / 100)
+        else:
+            block = book.reading_block
+        block, index = ArtifactService.locate(artifact, block)
+
+        chunk = ReadingService.build_chunk(book, artifact, index, RenderService.is_rendered(book))
+        chunk['block'] = block
+        chunk['progress'] = ArtifactService.block_progress(artifact, block)
+        return chunk
+
+    @staticmethod
+    def update_position(book_id, block):
+        try:
+            block_value = int(block)
+        except (TypeError, ValueError):
+            raise Exception("Некорректная позиция чтения")
+        if block_value < 0:
+            raise Exception("Некорректная позиция чтения")
+
+        ProgressBuffer.record(book_id, block_value)
+        return True
+
+    @classmethod
+    def sync_positions(cls, updates):
+        accepted = 0
+        for update in updates:
+            book_id, _, block = update.partition(':')
+            try:
+                book_id = uuid.UUID(book_id)
+                cls.update_position(book_id, block)
+            except Exception:
+                continue
+            accepted += 1
+        if accepted:
+            ProgressBuffer.flush()
+        return accepted
+
+    @staticmethod
+    def touch_last_read(book):
+        now = timezone.now()
+        threshold = now - timedelta(seconds=settings.LAST_READ_RESOLUTION)
+        if book.last_read and book.last_read > threshold:
+            return False
+
+        book.last_read = now
+        Book.objects.filter(id=book.id).filter(
+            Q(last_read__isnull=True) | Q(last_read__lte=threshold)
+        ).update(last_read=now)
+        return True
 
     @staticmethod
     def get_reading_settings(book_id):
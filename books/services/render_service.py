@@ -0,0 +1,92 @@
+import gzip
+import os
+import shutil
+import threading
+import brotli
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.urls import reverse
+from ..models import Book
+from .fb2_parser import PARSER_VERSION
+
+
+class RenderService:
+
+    TEMPLATE = 'books/partials/reader_chunk.html'
+
+    @staticmethod
+    def relative_root(content_hash):
+        return f'rendered/{content_hash[:2]}/{content_hash}'
+
+    @classmethod
+    def root(cls, content_hash):
+        return os.path.join(settings.MEDIA_ROOT, cls.relative_root(content_hash))
+
+    @classmethod
+    def directory(cls, content_hash, version=PARSER_VERSION):
+        return os.path.join(cls.root(content_hash), f'v{version}')
+
+    @classmethod
+    def is_rendered(cls, book):
+        return bool(book.content_hash) and os.path.isdir(cls.directory(book.content_hash))
+
+    @classmethod
+    def chunk_url(cls, book, index, static):
+        if static:
+            return f'{settings.MEDIA_URL}{cls.relative_root(book.content_hash)}/v{PARSER_VERSION}/chunk-{index}.html'
+        return reverse('books:book_chunk', args=[book.id, index])
+
+    @staticmethod
+    def _write(path, data):
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    @classmethod
+    def write(cls, book, chunks, quality=None):
+        quality = settings.RENDER_BROTLI_QUALITY if quality is None else quality
+        target = cls.directory(book.content_hash)
+        suffix = f'{os.getpid()}.{threading.get_ident()}'
+        temp_dir = f'{target}.{suffix}.tmp'
+        old_dir = f'{target}.{suffix}.old.tmp'
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+
+        try:
+            count = 0
+            for chunk in chunks:
+                html = render_to_string(cls.TEMPLATE, {'book': book, 'chunk': chunk}).encode('utf-8')
+                path = os.path.join(temp_dir, f'chunk-{chunk["index"]}.html')
+                cls._write(path, html)
+                cls._write(f'{path}.br', brotli.compress(html, quality=quality))
+                cls._write(f'{path}.gz', gzip.compress(html, compresslevel=9, mtime=0))
+                count += 1
+
+            try:
+                os.rename(target, old_dir)
+            except FileNotFoundError:
+                pass
+            os.replace(temp_dir, target)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+
+        shutil.rmtree(old_dir, ignore_errors=True)
+        cls.prune(book.content_hash)
+        return count
+
+    @classmethod
+    def prune(cls, content_hash):
+        root = cls.root(content_hash)
+        if not os.path.isdir(root):
+            return
+        current = f'v{PARSER_VERSION}'
+        for name in os.listdir(root):
+            if name != current and not name.endswith('.tmp'):
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    @classmethod
+    def delete(cls, content_hash):
+        if not content_hash or Book.objects.filter(content_hash=content_hash).exists():
+            return
+        shutil.rmtree(cls.root(content_hash), ignore_errors=True)
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from ..models import SearchCacheEntry
+from .flibusta_service import AsyncFlibustaService, FlibustaService
+from .metrics import Metrics
+
+
+class SearchCacheService:
+
+    @staticmethod
+    def normalize(query):
+        return ' '.join((query or '').lower().split())
+
+    @staticmethod
+    def cache_key(normalized_query):
+        return hashlib.sha256(normalized_query.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def lookup(cls, key, normalized_query):
+        entry = SearchCacheEntry.objects.filter(key=key).first()
+
+        if entry is not None:
+            age = timezone.now() - entry.fetched_at
+            if age < timedelta(seconds=settings.SEARCH_CACHE_TTL):
+                Metrics.cache_result('search', 'hit')
+                return entry.results
+            if age < timedelta(seconds=settings.SEARCH_CACHE_TTL + settings.SEARCH_CACHE_STALE_TTL):
+                Metrics.cache_result('search', 'stale')
+                cls.refresh_in_background(key, normalized_query)
+                return entry.results
+
+        Metrics.cache_result('search', 'miss')
+        return None
+
+    @classmethod
+    def search(cls, query):
+        normalized_query = cls.normalize(query)
+        if not normalized_query:
+            return []
+
+        key = cls.cache_key(normalized_query)
+        results = cls.lookup(key, normalized_query)
+        if results is not None:
+            return results
+
+        results = FlibustaService().search(normalized_query)
+        cls.store(key, normalized_query, results)
+        return results
+
+    @classmethod
+    async def asearch(cls, query):
+        normalized_query = cls.normalize(query)
+        if not normalized_query:
+            return []
+
+        key = cls.cache_key(normalized_query)
+        results = await sync_to_async(cls.lookup)(key, normalized_query)
+        if results is not None:
+            return results
+
+        results = await AsyncFlibustaService().search(normalized_query)
+        await sync_to_async(cls.store)(key, normalized_query, results)
+        return results
+
+    @staticmethod
+    def store(key, normalized_query, results):
+        SearchCacheEntry.objects.update_or_create(
+            key=key,
+            defaults={
+                'query': normalized_query[:500],
+                'results': results,
+                'fetched_at': timezone.now(),
+                'refreshing_at': None,
+            }
+        )
+
+        expired = SearchCacheEntry.objects.order_by('-fetched_at').values_list('id', flat=True)[settings.SEARCH_CACHE_MAX_ENTRIES:]
+        expired_ids = list(expired)
+        if expired_ids:
+            SearchCacheEntry.objects.filter(id__in=expired_ids).delete()
+
+    @classmethod
+    def refresh_in_background(cls, key, normalized_query):
+        now = timezone.now()
+        lock_expired = now - timedelta(seconds=settings.SEARCH_CACHE_REFRESH_TIMEOUT)
+        claimed = SearchCacheEntry.objects.filter(key=key).filter(
+            Q(refreshing_at__isnull=True) | Q(refreshing_at__lt=lock_expired)
+        ).update(refreshing_at=now)
+
+        if claimed:
+            threading.Thread(target=cls.refresh, args=(key, normalized_query), daemon=True).start()
+
+    @classmethod
+    def refresh(cls, key, normalized_query):
+        try:
+            results = FlibustaService().search(normalized_query)
+            cls.store(key, normalized_query, results)
+        except Exception:
+            SearchCacheEntry.objects.filter(key=key).update(refreshing_at=None)
+        finally:
+            connection.close()
@@ -0,0 +1,82 @@
+import re
+import uuid
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from ..models import Book
+from .artifact_service import ArtifactService
+
+
+class SearchIndexService:
+
+    TABLE = 'books_book_fts'
+    INDEXED_FIELDS = frozenset(['title', 'author', 'content_hash'])
+    SNIPPET_START = '\x02'
+    SNIPPET_END = '\x03'
+
+    @classmethod
+    def index(cls, book, body=None):
+        if body is None:
+            artifact = ArtifactService.read(book.content_hash) if book.content_hash else None
+            body = ArtifactService.text(artifact) if artifact else ''
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {cls.TABLE} WHERE book_id = %s', [str(book.id)])
+            cursor.execute(
+                f'INSERT INTO {cls.TABLE} (book_id, title, author, body) VALUES (%s, %s, %s, %s)',
+                [str(book.id), book.title, book.author, body]
+            )
+
+    @classmethod
+    def remove(cls, book_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {cls.TABLE} WHERE book_id = %s', [str(book_id)])
+
+    @classmethod
+    def indexed_ids(cls):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT book_id FROM {cls.TABLE}')
+            return {row[0] for row in cursor.fetchall()}
+
+    @staticmethod
+    def build_match(query):
+        terms = re.findall(r'\w+', query)
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    @classmethod
+    def search(cls, query, limit=50):
+        match = cls.build_match(query)
+        if not match:
+            return []
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT book_id, snippet({cls.TABLE}, 3, %s, %s, %s, 16) '
+                f'FROM {cls.TABLE} WHERE {cls.TABLE} MATCH %s '
+                f'ORDER BY bm25({cls.TABLE}, 0, 10.0, 5.0, 1.0) LIMIT %s',
+                [cls.SNIPPET_START, cls.SNIPPET_END, '…', match, limit]
+            )
+            return cursor.fetchall()
+
+    @classmethod
+    def search_books(cls, query, limit=50):
+        matches = [(uuid.UUID(book_id), snippet) for book_id, snippet in cls.search(query, limit)]
+        books = Book.objects.in_bulk([book_id for book_id, _ in matches])
+
+        results = []
+        for book_id, snippet in matches:
+            book = books.get(book_id)
+            if book is None:
+                continue
+            book.snippet = cls.highlight(snippet)
+            results.append(book)
+        return results
+
+    @classmethod
+    def highlight(cls, snippet):
+        if not snippet or cls.SNIPPET_START not in snippet:
+            return ''
+        html = escape(snippet)
+        html = html.replace(cls.SNIPPET_START, '<mark class="bg-blue-500/20 text-blue-400">')
+        html = html.replace(cls.SNIPPET_END, '</mark>')
+        return mark_safe(html)
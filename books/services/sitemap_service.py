@@ -0,0 +1,79 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max
+from ..models import Book
+
+
+class SitemapService:
+
+    HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+    BATCH_SIZE = 2000
+
+    @staticmethod
+    def stats():
+        return Book.objects.aggregate(count=Count('id'), latest=Max('created_at'))
+
+    @staticmethod
+    def page_count(book_count):
+        return (book_count + settings.SITEMAP_PAGE_SIZE) // settings.SITEMAP_PAGE_SIZE
+
+    @staticmethod
+    def page_bounds(page):
+        size = settings.SITEMAP_PAGE_SIZE
+        start = max(page * size - 1, 0)
+        end = (page + 1) * size - 1
+        return start, end
+
+    @classmethod
+    def page_last_modified(cls, page, book_count):
+        start, end = cls.page_bounds(page)
+        index = min(end, book_count) - 1
+        if index < start:
+            return None
+        return Book.objects.order_by('created_at', 'id').values_list('created_at', flat=True)[index]
+
+    @classmethod
+    async def stream_index(cls, base_url, book_count):
+        yield cls.HEADER
+        yield '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        for page in range(cls.page_count(book_count)):
+            yield '  <sitemap>\n'
+            yield f'    <loc>{base_url}/sitemap-{page + 1}.xml</loc>\n'
+            lastmod = await sync_to_async(cls.page_last_modified)(page, book_count)
+            if lastmod:
+                yield f'    <lastmod>{lastmod.strftime("%Y-%m-%d")}</lastmod>\n'
+            yield '  </sitemap>\n'
+        yield '</sitemapindex>'
+
+    @classmethod
+    async def stream_page(cls, base_url, page):
+        yield cls.HEADER
+        yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+        if page == 0:
+            yield (
+                '  <url>\n'
+                f'    <loc>{base_url}/</loc>\n'
+                '    <changefreq>daily</changefreq>\n'
+                '    <priority>1.0</priority>\n'
+                '  </url>\n'
+            )
+
+        start, end = cls.page_bounds(page)
+        books = Book.objects.only('id', 'created_at').order_by('created_at', 'id')[start:end]
+        parts = []
+        async for book in books.aiterator(chunk_size=cls.BATCH_SIZE):
+            parts.append(
+                '  <url>\n'
+                f'    <loc>{base_url}/book/{book.id}/</loc>\n'
+                f'    <lastmod>{book.created_at.strftime("%Y-%m-%d")}</lastmod>\n'
+                '    <changefreq>monthly</changefreq>\n'
+                '    <priority>0.8</priority>\n'
+                '  </url>\n'
+            )
+            if len(parts) >= cls.BATCH_SIZE:
+                yield ''.join(parts)
+                parts = []
+
+        parts.append('</urlset>')
+        yield ''.join(parts)
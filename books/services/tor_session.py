@@ -0,0 +1,128 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from .mirror_pool import MirrorPool
+
+
+class TorSessionPool:
+
+    _lock = threading.Lock()
+    _session = None
+    _pid = None
+    _last_checked = 0.0
+    _checking = False
+
+    @staticmethod
+    def proxies():
+        if not settings.TOR_PROXY_HOST:
+            return {}
+        proxy = f'socks5h://{settings.TOR_PROXY_HOST}:{settings.TOR_PROXY_PORT}'
+        return {'http': proxy, 'https': proxy}
+
+    @classmethod
+    def create_session(cls):
+        session = requests.Session()
+        session.proxies.update(cls.proxies())
+
+        retries = Retry(
+            total=2,
+            connect=2,
+            read=1,
+            status=0,
+            backoff_factor=0.5,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=settings.TOR_POOL_CONNECTIONS,
+            pool_maxsize=settings.TOR_POOL_MAXSIZE,
+            max_retries=retries
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @classmethod
+    def get_session(cls):
+        with cls._lock:
+            if cls._session is None or cls._pid != os.getpid():
+                cls._session = cls.create_session()
+                cls._pid = os.getpid()
+                cls._last_checked = time.monotonic()
+            session = cls._session
+            check_due = (
+                not cls._checking
+                and time.monotonic() - cls._last_checked > settings.TOR_HEALTH_CHECK_INTERVAL
+            )
+            if check_due:
+                cls._checking = True
+
+        if check_due:
+            threading.Thread(target=cls.health_check, args=(session,), daemon=True).start()
+        return session
+
+    @classmethod
+    def recycle(cls, session=None):
+        with cls._lock:
+            if session is None or session is cls._session:
+                cls._session = None
+
+    @classmethod
+    def health_check(cls, session):
+        try:
+            response = session.head(MirrorPool.ordered()[0], timeout=settings.TOR_HEALTH_CHECK_TIMEOUT)
+            healthy = response.status_code < 500
+        except requests.RequestException:
+            healthy = False
+        finally:
+            with cls._lock:
+                cls._checking = False
+                cls._last_checked = time.monotonic()
+
+        if not healthy:
+            cls.recycle(session)
+        return healthy
+
+
+class AsyncTorClientPool:
+
+    _clients = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def proxy():
+        if not settings.TOR_PROXY_HOST:
+            return None
+        return f'socks5h://{settings.TOR_PROXY_HOST}:{settings.TOR_PROXY_PORT}'
+
+    @classmethod
+    def create_client(cls):
+        limits = httpx.Limits(
+            max_connections=settings.TOR_POOL_MAXSIZE,
+            max_keepalive_connections=settings.TOR_POOL_MAXSIZE,
+            keepalive_expiry=settings.TOR_KEEPALIVE_EXPIRY
+        )
+        transport = httpx.AsyncHTTPTransport(proxy=cls.proxy(), limits=limits, retries=2)
+        return httpx.AsyncClient(transport=transport, timeout=httpx.Timeout(30, connect=30))
+
+    @classmethod
+    def get_client(cls):
+        loop = asyncio.get_running_loop()
+        client = cls._clients.get(loop)
+        if client is None or client.is_closed:
+            client = cls.create_client()
+            cls._clients[loop] = client
+        return client
+
+    @classmethod
+    async def recycle(cls, client):
+        loop = asyncio.get_running_loop()
+        if cls._clients.get(loop) is client:
+            del cls._clients[loop]
+        await client.aclose()
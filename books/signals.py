@@ -0,0 +1,23 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Book
+from .services.metrics import Metrics
+from .services.search_index import SearchIndexService
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SearchIndexService.INDEXED_FIELDS.intersection(update_fields):
+        return
+    SearchIndexService.index(instance)
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    SearchIndexService.remove(instance.id)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    Metrics.install(connection)
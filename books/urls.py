@@ -7,11 +7,19 @@ urlpatterns = [
     path('', views.library_view, name='library'),
     path('last-read/', views.last_read_view, name='last_read'),
     path('book/<uuid:book_id>/', views.book_detail_view, name='book_detail'),
+    path('book/<uuid:book_id>/chunk/<int:index>/', views.book_chunk_view, name='book_chunk'),
+    path('book/<uuid:book_id>/chapter/<int:number>/', views.book_chapter_view, name='book_chapter'),
     path('book/<uuid:book_id>/progress/', views.update_progress_view, name='update_progress'),
+    path('progress/sync/', views.progress_sync_view, name='progress_sync'),
     path('search/', views.search_view, name='search'),
     path('download/', views.download_book_view, name='download'),
+    path('download/bulk/', views.bulk_download_view, name='bulk_download'),
+    path('download/batch/<uuid:batch_id>/', views.download_batch_view, name='download_batch'),
+    path('download/<uuid:job_id>/', views.download_status_view, name='download_status'),
     path('book/<uuid:book_id>/delete/', views.delete_book_view, name='delete_book'),
     path('offline/', views.offline_view, name='offline'),
     path('sitemap.xml', views.sitemap_view, name='sitemap'),
+    path('sitemap-<int:page>.xml', views.sitemap_page_view, name='sitemap_page'),
     path('robots.txt', views.robots_view, name='robots'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
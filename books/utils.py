@@ -1,2 +1,46 @@
+import hashlib
+from asgiref.sync import sync_to_async
+from django.contrib.messages import get_messages
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from .services.metrics import Metrics
+
+
 def is_htmx(request):
     return request.headers.get('HX-Request') == 'true'
+
+
+async def arender(request, template_name, context=None):
+    return await sync_to_async(render)(request, template_name, context)
+
+
+def make_etag(request, *parts):
+    parts = (*parts, is_htmx(request))
+    digest = hashlib.sha256('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return quote_etag(digest[:32])
+
+
+def not_modified(request, etag, last_modified=None, max_age=None):
+    if get_messages(request):
+        Metrics.cache_result('conditional', 'miss')
+        return None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        Metrics.cache_result('conditional', 'hit')
+        return with_validators(response, etag, last_modified, max_age)
+    Metrics.cache_result('conditional', 'miss')
+    return None
+
+
+def with_validators(response, etag, last_modified=None, max_age=None):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(int(last_modified.timestamp()))
+    if max_age is not None:
+        patch_cache_control(response, public=True, max_age=max_age)
+        return response
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie', 'HX-Request'))
+    return response
@@ -1,41 +1,61 @@
 import os
-from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import aget_object_or_404, render, get_object_or_404, redirect
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views.decorators.http import require_http_methods
-from django.core.files import File
-from django.db.models import Q
 from django.contrib import messages
-from django.utils import timezone
-from .models import Book
-from .services.flibusta_service import FlibustaService
-from .services.fb2_parser import FB2Parser
+from prometheus_client import CONTENT_TYPE_LATEST
+from .models import Book, DownloadJob
+from .services.artifact_service import ArtifactService
+from .services.cover_service import CoverService
+from .services.download_queue import DownloadQueueService
+from .services.fb2_parser import PARSER_VERSION
+from .services.library_service import LibraryService
+from .services.metrics import Metrics
+from .services.progress_buffer import ProgressBuffer
 from .services.reading_service import ReadingService
-from .utils import is_htmx
+from .services.render_service import RenderService
+from .services.search_cache import SearchCacheService
+from .services.search_index import SearchIndexService
+from .services.sitemap_service import SitemapService
+from .utils import arender, is_htmx, make_etag, not_modified, with_validators
 
 
 @require_http_methods(["GET"])
-def library_view(request):
-    books = Book.objects.all()
+@ensure_csrf_cookie
+async def library_view(request):
     query = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor')
     flibusta_results = []
     flibusta_error = None
+    next_cursor = None
+
+    user = await request.auser()
 
     if query:
-        books = books.filter(
-            Q(title__icontains=query) | Q(author__icontains=query)
-        )
+        books = await sync_to_async(SearchIndexService.search_books)(query)
 
-        if request.user.is_authenticated:
+        if user.is_authenticated:
             try:
-                service = FlibustaService()
-                flibusta_results = service.search(query)
+                flibusta_results = await SearchCacheService.asearch(query)
             except Exception as e:
                 flibusta_error = str(e)
         else:
             flibusta_error = 'Поиск на Флибусте доступен только для авторизованных пользователей'
+    else:
+        stamp = await sync_to_async(LibraryService.stamp)()
+        etag = make_etag(request, stamp['count'], stamp['updated_at'] and stamp['updated_at'].timestamp(), cursor)
+        response = await sync_to_async(not_modified)(request, etag, stamp['updated_at'])
+        if response is not None:
+            return response
+
+        books, next_cursor = await sync_to_async(LibraryService.get_page)(cursor)
 
     context = {
         'books': books,
+        'next_cursor': next_cursor,
         'query': query,
         'flibusta_results': flibusta_results,
         'flibusta_error': flibusta_error,
@@ -44,73 +64,141 @@ def library_view(request):
 
     if is_htmx(request):
         if query:
-            return render(request, 'books/partials/search_results.html', context)
-        return render(request, 'books/partials/library_content.html', context)
+            return await arender(request, 'books/partials/search_results.html', context)
+        if cursor:
+            template_name = 'books/partials/book_grid_page.html'
+        else:
+            template_name = 'books/partials/library_content.html'
+    else:
+        template_name = 'books/library.html'
 
-    return render(request, 'books/library.html', context)
+    response = await arender(request, template_name, context)
+    if not query:
+        response = with_validators(response, etag, stamp['updated_at'])
+    return response
 
 
 @require_http_methods(["GET"])
+@ensure_csrf_cookie
 def book_detail_view(request, book_id):
     book = get_object_or_404(Book, id=book_id)
-    book.last_read = timezone.now()
-    book.save(update_fields=['last_read'])
+    book.reading_block = ProgressBuffer.pending_block(book.id, book.reading_block)
+    ReadingService.touch_last_read(book)
+
+    etag = make_etag(request, book.content_hash, PARSER_VERSION, RenderService.is_rendered(book), book.reading_block, book.reading_progress, book.updated_at.timestamp())
+    response = not_modified(request, etag, book.updated_at)
+    if response is not None:
+        return response
 
     try:
-        text = ReadingService.get_book_text(book_id)
+        chunk = ReadingService.get_initial_chunk(book)
         context = {
             'book': book,
-            'text': text,
+            'chunk': chunk,
+            'toc': ReadingService.get_toc(book),
             'is_htmx': is_htmx(request)
         }
 
         if is_htmx(request):
-            return render(request, 'books/partials/reader_content.html', context)
-
-        return render(request, 'books/reader.html', context)
+            response = render(request, 'books/partials/reader_content.html', context)
+        else:
+            response = render(request, 'books/reader.html', context)
+        return with_validators(response, etag, book.updated_at)
     except Exception as e:
         if is_htmx(request):
             return HttpResponse(f'<div class="error text-red-400">{str(e)}</div>', status=400)
         return render(request, 'books/error.html', {'error': str(e)})
 
 
+@require_http_methods(["GET"])
+def book_chunk_view(request, book_id, index):
+    book = get_object_or_404(Book, id=book_id)
+
+    etag = make_etag(request, book.content_hash, PARSER_VERSION, RenderService.is_rendered(book), index, book.updated_at.timestamp())
+    response = not_modified(request, etag, book.updated_at)
+    if response is not None:
+        return response
+
+    try:
+        chunk = ReadingService.get_chunk(book, index)
+    except Exception as e:
+        return HttpResponse(f'<div class="error text-red-400">{str(e)}</div>', status=404)
+
+    response = render(request, 'books/partials/reader_chunk.html', {'book': book, 'chunk': chunk})
+    return with_validators(response, etag, book.updated_at)
+
+
+@require_http_methods(["GET"])
+def book_chapter_view(request, book_id, number):
+    book = get_object_or_404(Book, id=book_id)
+
+    etag = make_etag(request, book.content_hash, PARSER_VERSION, RenderService.is_rendered(book), 'chapter', number, book.updated_at.timestamp())
+    response = not_modified(request, etag, book.updated_at)
+    if response is not None:
+        return response
+
+    try:
+        chunk = ReadingService.get_chapter(book, number)
+    except Exception as e:
+        return HttpResponse(f'<div class="error text-red-400">{str(e)}</div>', status=404)
+
+    response = render(request, 'books/partials/reader_chunk.html', {'book': book, 'chunk': chunk})
+    return with_validators(response, etag, book.updated_at)
+
+
 @require_http_methods(["POST"])
 def update_progress_view(request, book_id):
     try:
-        progress = request.POST.get('progress', 0)
-        ReadingService.update_progress(book_id, progress)
+        block = int(request.POST['block'])
+    except (KeyError, ValueError):
+        return HttpResponse('Error: Некорректная позиция чтения', status=400)
+
+    try:
+        ReadingService.update_position(book_id, block)
         return HttpResponse(status=204)
     except Exception as e:
         return HttpResponse(f'Error: {str(e)}', status=400)
 
 
+@require_http_methods(["POST"])
+def progress_sync_view(request):
+    try:
+        accepted = ReadingService.sync_positions(request.POST.getlist('update'))
+    except Exception as e:
+        return HttpResponse(f'Error: {str(e)}', status=503)
+    if not accepted:
+        return HttpResponse('Error: нет корректных обновлений прогресса', status=400)
+    return HttpResponse(status=204)
+
+
 @require_http_methods(["GET"])
-def search_view(request):
+async def search_view(request):
     query = request.GET.get('q', '').strip()
 
     if not query:
-        return render(request, 'books/partials/flibusta_results.html', {'results': []})
+        return await arender(request, 'books/partials/flibusta_results.html', {'results': []})
 
-    if not request.user.is_authenticated:
-        return render(request, 'books/partials/flibusta_results.html', {
+    user = await request.auser()
+    if not user.is_authenticated:
+        return await arender(request, 'books/partials/flibusta_results.html', {
             'results': [],
             'error': 'Поиск на Флибусте доступен только для авторизованных пользователей'
         })
 
     try:
-        service = FlibustaService()
-        results = service.search(query)
-        return render(request, 'books/partials/flibusta_results.html', {'results': results})
+        results = await SearchCacheService.asearch(query)
+        return await arender(request, 'books/partials/flibusta_results.html', {'results': results, 'query': query})
     except Exception as e:
-        return render(request, 'books/partials/flibusta_results.html', {
+        return await arender(request, 'books/partials/flibusta_results.html', {
             'results': [],
             'error': str(e)
         })
 
 
 @require_http_methods(["POST"])
-def download_book_view(request):
-    if not request.user.is_authenticated:
+async def download_book_view(request):
+    user = await request.auser()
+    if not user.is_authenticated:
         return HttpResponse('<div class="error">Скачивание с Флибусты доступно только для авторизованных пользователей</div>', status=403)
 
     book_id = request.POST.get('book_id')
@@ -120,46 +208,61 @@ def download_book_view(request):
     if not book_id:
         return HttpResponse('<div class="error">Не указан ID книги</div>', status=400)
 
-    try:
-        service = FlibustaService()
-        file_path = service.download_book(book_id)
+    job = await sync_to_async(DownloadQueueService.enqueue)(book_id, title, author)
+    return await arender(request, 'books/partials/download_status.html', {'job': job})
+
+
+@require_http_methods(["POST"])
+async def bulk_download_view(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse('<div class="error">Скачивание с Флибусты доступно только для авторизованных пользователей</div>', status=403)
 
-        parser = FB2Parser(file_path)
-        book_data = parser.parse()
+    query = request.POST.get('q', '').strip()
+    book_ids = request.POST.getlist('book_id')
+    download_all = request.POST.get('all') == '1'
 
-        book = Book()
-        book.title = book_data.get('title', title)
-        book.author = book_data.get('author', author)
-        book.flibusta_id = book_id
+    results = []
+    if query:
+        try:
+            results = await SearchCacheService.asearch(query)
+        except Exception as e:
+            return HttpResponse(f'<div class="error text-red-400">{str(e)}</div>', status=502)
 
-        with open(file_path, 'rb') as f:
-            book.file.save(os.path.basename(file_path), File(f), save=False)
+    if download_all:
+        items = results
+    else:
+        known = {result['id']: result for result in results}
+        items = [known.get(book_id, {'id': book_id}) for book_id in book_ids]
 
-        if book_data.get('cover'):
-            book.cover = book_data['cover']
+    if not items:
+        return HttpResponse('<div class="error">Не выбрано ни одной книги</div>', status=400)
 
-        book.save()
+    batch, _ = await sync_to_async(DownloadQueueService.enqueue_batch)(items)
+    progress = await sync_to_async(DownloadQueueService.batch_progress)(batch)
+    return await arender(request, 'books/partials/download_batch.html', progress)
 
-        if os.path.exists(file_path):
-            os.remove(file_path)
 
-        if is_htmx(request):
-            messages.success(request, f'Книга "{book.title}" успешно скачана')
-
-            books = Book.objects.all()
-            context = {
-                'books': books,
-                'query': '',
-                'flibusta_results': [],
-                'flibusta_error': None,
-                'is_htmx': True
-            }
-            return render(request, 'books/partials/library_content.html', context)
+@require_http_methods(["GET"])
+async def download_batch_view(request, batch_id):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse('<div class="error">Скачивание с Флибусты доступно только для авторизованных пользователей</div>', status=403)
 
-        return HttpResponse('OK')
+    progress = await sync_to_async(DownloadQueueService.batch_progress)(batch_id)
+    if not progress['total']:
+        return HttpResponse('<div class="error">Пакет не найден</div>', status=404)
+    return await arender(request, 'books/partials/download_batch.html', progress)
 
-    except Exception as e:
-        return HttpResponse(f'<div class="error">Ошибка: {str(e)}</div>', status=400)
+
+@require_http_methods(["GET"])
+async def download_status_view(request, job_id):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse('<div class="error">Скачивание с Флибусты доступно только для авторизованных пользователей</div>', status=403)
+
+    job = await aget_object_or_404(DownloadJob, id=job_id)
+    return await arender(request, 'books/partials/download_status.html', {'job': job})
 
 
 @require_http_methods(["DELETE", "POST"])
@@ -171,11 +274,10 @@ def delete_book_view(request, book_id):
             if os.path.exists(book.file.path):
                 os.remove(book.file.path)
 
-        if book.cover:
-            if os.path.exists(book.cover.path):
-                os.remove(book.cover.path)
-
         book.delete()
+        ArtifactService.delete(book.content_hash)
+        RenderService.delete(book.content_hash)
+        CoverService.delete(book)
 
         if is_htmx(request):
             messages.success(request, 'Книга удалена')
@@ -200,30 +302,43 @@ def last_read_view(request):
     return redirect('books:book_detail', book_id=last_book.id)
 
 
-@require_http_methods(["GET"])
-def sitemap_view(request):
-    books = Book.objects.all()
+async def sitemap_response(request, page=None):
+    stats = await sync_to_async(SitemapService.stats)()
+    etag = make_etag(request, 'sitemap', stats['count'], stats['latest'] and stats['latest'].timestamp(), settings.SITEMAP_PAGE_SIZE, page)
+
+    response = await sync_to_async(not_modified)(request, etag, stats['latest'], settings.SITEMAP_CACHE_MAX_AGE)
+    if response is not None:
+        return response
 
-    sitemap_xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    sitemap_xml += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    base_url = f'{request.scheme}://{request.get_host()}'
+    page_count = SitemapService.page_count(stats['count'])
 
-    sitemap_xml += '  <url>\n'
-    sitemap_xml += f'    <loc>{request.scheme}://{request.get_host()}/</loc>\n'
-    sitemap_xml += '    <changefreq>daily</changefreq>\n'
-    sitemap_xml += '    <priority>1.0</priority>\n'
-    sitemap_xml += '  </url>\n'
+    if page is None and page_count > 1:
+        stream = SitemapService.stream_index(base_url, stats['count'])
+    elif page is None:
+        stream = SitemapService.stream_page(base_url, 0)
+    elif 1 <= page <= page_count:
+        stream = SitemapService.stream_page(base_url, page - 1)
+    else:
+        raise Http404('Страница карты сайта не найдена')
 
-    for book in books:
-        sitemap_xml += '  <url>\n'
-        sitemap_xml += f'    <loc>{request.scheme}://{request.get_host()}/book/{book.id}/</loc>\n'
-        sitemap_xml += f'    <lastmod>{book.created_at.strftime("%Y-%m-%d")}</lastmod>\n'
-        sitemap_xml += '    <changefreq>monthly</changefreq>\n'
-        sitemap_xml += '    <priority>0.8</priority>\n'
-        sitemap_xml += '  </url>\n'
+    response = StreamingHttpResponse(stream, content_type='application/xml')
+    return with_validators(response, etag, stats['latest'], settings.SITEMAP_CACHE_MAX_AGE)
 
-    sitemap_xml += '</urlset>'
 
-    return HttpResponse(sitemap_xml, content_type='application/xml')
+@require_http_methods(["GET"])
+async def sitemap_view(request):
+    return await sitemap_response(request)
+
+
+@require_http_methods(["GET"])
+async def sitemap_page_view(request, page):
+    return await sitemap_response(request, page)
+
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    return HttpResponse(Metrics.render(), content_type=CONTENT_TYPE_LATEST)
 
 
 @require_http_methods(["GET"])
@@ -241,6 +356,7 @@ Sitemap: {request.scheme}://{request.get_host()}/sitemap.xml
 
 
 @require_http_methods(["GET"])
+@ensure_csrf_cookie
 def offline_view(request):
     """Страница для offline режима PWA"""
     return render(request, 'books/offline.html')
@@ -0,0 +1,35 @@
+import glob
+import os
+import decouple
+from prometheus_client import multiprocess
+from prometheus_client.mmap_dict import MmapedDict
+
+bind = '0.0.0.0:8000'
+workers = decouple.config('GUNICORN_WORKERS', default=4, cast=int)
+worker_class = 'uvicorn_worker.UvicornWorker'
+max_requests = decouple.config('GUNICORN_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = decouple.config('GUNICORN_MAX_REQUESTS_JITTER', default=50, cast=int)
+timeout = 120
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
+
+
+def compact_metrics(path, pid):
+    for filename in glob.glob(os.path.join(path, f'*_{pid}.db')):
+        typ = os.path.basename(filename).split('_')[0]
+        if typ != 'gauge':
+            archive = MmapedDict(os.path.join(path, f'{typ}_archive.db'))
+            try:
+                for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(filename):
+                    archive.write_value(key, archive.read_value(key)[0] + value, timestamp)
+            finally:
+                archive.close()
+        os.remove(filename)
+
+
+def child_exit(server, worker):
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        multiprocess.mark_process_dead(worker.pid)
+        compact_metrics(path, worker.pid)
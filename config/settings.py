@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'books.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'csp.middleware.CSPMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -133,11 +134,53 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+ARTIFACT_ROOT = BASE_DIR / config('ARTIFACT_ROOT', default='data/artifacts')
+ARTIFACT_CACHE_MAX_BYTES = config('ARTIFACT_CACHE_MAX_BYTES', default=64 * 1024 * 1024, cast=int)
+LIBRARY_PAGE_SIZE = config('LIBRARY_PAGE_SIZE', default=24, cast=int)
+SITEMAP_PAGE_SIZE = config('SITEMAP_PAGE_SIZE', default=50000, cast=int)
+SITEMAP_CACHE_MAX_AGE = config('SITEMAP_CACHE_MAX_AGE', default=3600, cast=int)
+READER_CHUNK_SIZE = config('READER_CHUNK_SIZE', default=20000, cast=int)
+PROGRESS_FLUSH_INTERVAL = config('PROGRESS_FLUSH_INTERVAL', default=5, cast=float)
+LAST_READ_RESOLUTION = config('LAST_READ_RESOLUTION', default=300, cast=int)
+RENDER_BROTLI_QUALITY = config('RENDER_BROTLI_QUALITY', default=11, cast=int)
+RENDER_BULK_BROTLI_QUALITY = config('RENDER_BULK_BROTLI_QUALITY', default=5, cast=int)
+METRICS_SHARED_DIRS = config('METRICS_SHARED_DIRS', default='', cast=Csv())
+
+FB2_MAX_SIZE = config('FB2_MAX_SIZE', default=100 * 1024 * 1024, cast=int)
+FB2_MAX_BINARY_SIZE = config('FB2_MAX_BINARY_SIZE', default=10 * 1024 * 1024, cast=int)
+BOOK_STORAGE_COMPRESSLEVEL = config('BOOK_STORAGE_COMPRESSLEVEL', default=6, cast=int)
+BOOK_IMAGE_MAX_SIZE = config('BOOK_IMAGE_MAX_SIZE', default=1600, cast=int)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 FLIBUSTA_ONION = config('FLIBUSTA_ONION', default='http://flibustahezeous3.onion')
+FLIBUSTA_MIRRORS = config('FLIBUSTA_MIRRORS', default=FLIBUSTA_ONION, cast=Csv())
+FLIBUSTA_HEDGE_DELAY = config('FLIBUSTA_HEDGE_DELAY', default=2.0, cast=float)
+FLIBUSTA_MIRROR_ERROR_PENALTY = config('FLIBUSTA_MIRROR_ERROR_PENALTY', default=30.0, cast=float)
 TOR_PROXY_HOST = config('TOR_PROXY_HOST', default='127.0.0.1')
 TOR_PROXY_PORT = config('TOR_PROXY_PORT', default='9050')
+TOR_POOL_CONNECTIONS = config('TOR_POOL_CONNECTIONS', default=4, cast=int)
+TOR_POOL_MAXSIZE = config('TOR_POOL_MAXSIZE', default=10, cast=int)
+TOR_HEALTH_CHECK_INTERVAL = config('TOR_HEALTH_CHECK_INTERVAL', default=300, cast=int)
+TOR_HEALTH_CHECK_TIMEOUT = config('TOR_HEALTH_CHECK_TIMEOUT', default=30, cast=int)
+TOR_KEEPALIVE_EXPIRY = config('TOR_KEEPALIVE_EXPIRY', default=60, cast=int)
+
+SEARCH_CACHE_TTL = config('SEARCH_CACHE_TTL', default=3600, cast=int)
+SEARCH_CACHE_STALE_TTL = config('SEARCH_CACHE_STALE_TTL', default=7 * 24 * 3600, cast=int)
+SEARCH_CACHE_MAX_ENTRIES = config('SEARCH_CACHE_MAX_ENTRIES', default=2000, cast=int)
+SEARCH_CACHE_REFRESH_TIMEOUT = config('SEARCH_CACHE_REFRESH_TIMEOUT', default=120, cast=int)
+
+DOWNLOAD_ROOT = BASE_DIR / config('DOWNLOAD_ROOT', default='data/downloads')
+FLIBUSTA_MAX_DOWNLOAD_SIZE = config('FLIBUSTA_MAX_DOWNLOAD_SIZE', default=50 * 1024 * 1024, cast=int)
+FLIBUSTA_DOWNLOAD_RESUME_ATTEMPTS = config('FLIBUSTA_DOWNLOAD_RESUME_ATTEMPTS', default=3, cast=int)
+
+DOWNLOAD_JOB_MAX_ATTEMPTS = config('DOWNLOAD_JOB_MAX_ATTEMPTS', default=5, cast=int)
+DOWNLOAD_JOB_RETRY_DELAY = config('DOWNLOAD_JOB_RETRY_DELAY', default=30, cast=int)
+DOWNLOAD_JOB_MAX_RETRY_DELAY = config('DOWNLOAD_JOB_MAX_RETRY_DELAY', default=3600, cast=int)
+DOWNLOAD_JOB_STALE_TIMEOUT = config('DOWNLOAD_JOB_STALE_TIMEOUT', default=600, cast=int)
+DOWNLOAD_WORKER_POLL_INTERVAL = config('DOWNLOAD_WORKER_POLL_INTERVAL', default=2, cast=float)
+DOWNLOAD_WORKER_CONCURRENCY = config('DOWNLOAD_WORKER_CONCURRENCY', default=4, cast=int)
+DOWNLOAD_BATCH_MAX_SIZE = config('DOWNLOAD_BATCH_MAX_SIZE', default=100, cast=int)
 
 CSP_DEFAULT_SRC = ("'self'",)
 CSP_SCRIPT_SRC = (
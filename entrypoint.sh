@@ -1,34 +1,60 @@
 #!/bin/bash
 set -e
 
-echo "Starting Tor service..."
-tor -f /etc/tor/torrc &
-TOR_PID=$!
-
-echo "Waiting for Tor to establish connection..."
-sleep 10
-
-if ! kill -0 $TOR_PID 2>/dev/null; then
-    echo "ERROR: Tor failed to start"
-    exit 1
-fi
-
-echo "Tor is running (PID: $TOR_PID)"
-
-echo "Running Django migrations..."
-python manage.py migrate --noinput
-
-echo "Collecting static files..."
-python manage.py collectstatic --noinput
-
-echo "Starting Gunicorn..."
-exec gunicorn config.wsgi:application \
-    --bind 0.0.0.0:8000 \
-    --workers 4 \
-    --worker-class sync \
-    --max-requests 1000 \
-    --max-requests-jitter 50 \
-    --timeout 120 \
-    --access-logfile - \
-    --error-logfile - \
-    --log-level info
+ROLE=${1:-web}
+
+start_tor() {
+    echo "Starting Tor service..."
+    tor -f /etc/tor/torrc &
+    TOR_PID=$!
+
+    echo "Waiting for Tor to establish connection..."
+    sleep 10
+
+    if ! kill -0 $TOR_PID 2>/dev/null; then
+        echo "ERROR: Tor failed to start"
+        exit 1
+    fi
+
+    echo "Tor is running (PID: $TOR_PID)"
+}
+
+prepare_metrics() {
+    echo "Preparing Prometheus metrics directory..."
+    export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+}
+
+case "$ROLE" in
+    web)
+        start_tor
+        prepare_metrics
+
+        echo "Running Django migrations..."
+        python manage.py migrate --noinput
+
+        echo "Collecting static files..."
+        python manage.py collectstatic --noinput
+
+        echo "Starting Gunicorn..."
+        exec gunicorn config.asgi:application --config config/gunicorn.py
+        ;;
+    worker)
+        start_tor
+        prepare_metrics
+
+        echo "Starting download worker..."
+        exec python manage.py download_worker
+        ;;
+    tasks)
+        echo "Indexing library for full-text search..."
+        python manage.py rebuild_search_index
+
+        echo "Pre-rendering reader fragments..."
+        exec python manage.py prerender_books
+        ;;
+    *)
+        exec "$@"
+        ;;
+esac
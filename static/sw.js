@@ -1,4 +1,4 @@
-const CACHE_VERSION = 'v1.0.0';
+const CACHE_VERSION = 'v1.1.0';
 const CACHE_NAME = `lumina-reader-${CACHE_VERSION}`;
 
 // Файлы для предварительного кэширования (статика)
@@ -17,13 +17,15 @@ const CACHE_PATTERNS = {
   // Статические файлы - Cache First
   static: /\.(css|js|svg|woff2?|ttf|eot)$/,
   // Изображения - Cache First
-  images: /\.(png|jpg|jpeg|gif|webp|ico)$/,
+  images: /\.(png|jpg|jpeg|gif|webp|avif|ico)$/,
   // API и динамический контент - Network First
   dynamic: /\/(book|search|last-read)/,
   // Обложки книг - Cache First
   covers: /\/media\/covers\//,
   // Файлы книг - Cache First (для offline чтения)
   books: /\/media\/books\//,
+  // Готовые фрагменты читалки - Cache First (путь содержит хэш и версию)
+  rendered: /\/media\/rendered\//,
 };
 
 // Установка Service Worker
@@ -98,7 +100,8 @@ async function handleFetch(request, url) {
       CACHE_PATTERNS.static.test(url.pathname) ||
       CACHE_PATTERNS.images.test(url.pathname) ||
       CACHE_PATTERNS.covers.test(url.pathname) ||
-      CACHE_PATTERNS.books.test(url.pathname)
+      CACHE_PATTERNS.books.test(url.pathname) ||
+      CACHE_PATTERNS.rendered.test(url.pathname)
     ) {
       return await cacheFirst(request);
     }